@@ -1,10 +1,34 @@
 import os
+import contextvars
+import cProfile
+import csv
+import hashlib
+import json
+import logging
+import hmac
+import math
+import pstats
+import queue
+import random
+import threading
+import time
 import traceback
+import uuid
 import re
-from io import BytesIO
-from flask import Flask, request, render_template, Response, stream_with_context, jsonify, send_file
+import socket
+import sqlite3
+import unicodedata
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeoutError
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+import click
+from flask import Flask, request, render_template, Response, stream_with_context, jsonify, send_file, g
 from dotenv import load_dotenv
+import groq
 from groq import Groq
+from groq.types.chat import ChatCompletion, ChatCompletionChunk
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -16,11 +40,1630 @@ load_dotenv()
 
 app = Flask(__name__)
 
-try:
-    client = Groq()
-except Exception as e:
-    print(f"Error initializing Groq client: {e}")
-    client = None
+# Record/replay of Groq completions ("cassettes") for offline, repeatable runs
+GROQ_CASSETTE_MODE = os.getenv('AURA_GROQ_CASSETTE', '').lower()  # record, replay or empty (off)
+GROQ_CASSETTE_PATH = os.getenv('AURA_GROQ_CASSETTE_PATH', os.path.join(app.instance_path, 'cassettes', 'groq.jsonl'))
+GROQ_CASSETTE_SPEED = float(os.getenv('AURA_GROQ_CASSETTE_SPEED', '1'))  # 0 replays without delays
+
+
+class CassetteMiss(LookupError):
+    """
+    Raised in replay mode for a request that has no recording.
+    """
+
+
+class GroqCassette:
+    """
+    JSONL store of recorded completions keyed by a normalized request hash.
+    Entries keep only text, usage and timing: streams as [delay_ms, text]
+    pairs, plain completions as content plus latency. Either kind can be
+    replayed as a stream or as a plain completion. Re-recording a request
+    appends a new line and the last line for a key wins, except that a plain
+    completion never replaces a stream's timing.
+    """
+
+    TRANSPORT_PARAMS = ('timeout', 'stream', 'extra_headers', 'extra_query', 'extra_body')
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    @classmethod
+    def key(cls, params):
+        """
+        Hashes what the request asks for: whitespace-normalized messages and
+        sampling params. Transport options and stream vs. plain are ignored.
+        """
+        normalized = {name: value for name, value in params.items() if name not in cls.TRANSPORT_PARAMS}
+        normalized["messages"] = [
+            {"role": m.get("role"), "content": " ".join(str(m.get("content") or "").split())}
+            for m in params.get("messages", [])
+        ]
+        payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            self.stats["hits" if entry else "misses"] += 1
+            return entry
+
+    def record(self, key, model, usage, content=None, chunks=None, latency_ms=None):
+        entry = {"key": key, "model": model}
+        if chunks is not None:
+            entry["chunks"] = chunks
+        else:
+            entry["content"] = content
+            entry["latency_ms"] = latency_ms
+        entry["usage"] = [getattr(usage, 'prompt_tokens', 0) or 0, getattr(usage, 'completion_tokens', 0) or 0]
+        with self._lock:
+            if chunks is None and "chunks" in self.entries.get(key, {}):
+                return  # a stream recording already covers this request, with timing
+            self.entries[key] = entry
+            self.stats["recorded"] += 1
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+
+    def snapshot(self):
+        with self._lock:
+            return {"path": self.path, "entries": len(self.entries), **self.stats}
+
+
+class RecordingStream:
+    """
+    Passes an upstream stream through while capturing each text chunk and its
+    delay since the previous one (the first delay is the TTFT). The recording
+    is saved only if the stream is read to the end.
+    """
+
+    def __init__(self, stream_response, started, on_complete):
+        self._upstream = stream_response
+        self._chunks_iter = iter(stream_response)
+        self._last = started
+        self._on_complete = on_complete
+        self.chunks = []
+        self.usage = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks_iter)
+        except StopIteration:
+            on_complete, self._on_complete = self._on_complete, None
+            if on_complete:
+                on_complete(self.chunks, self.usage)
+            raise
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        if text:
+            now = time.perf_counter()
+            self.chunks.append([round((now - self._last) * 1000), text])
+            self._last = now
+        x_groq = getattr(chunk, 'x_groq', None)
+        self.usage = getattr(x_groq, 'usage', None) or getattr(chunk, 'usage', None) or self.usage
+        return chunk
+
+    def close(self):
+        self._on_complete = None
+        close_upstream(self._upstream)
+
+
+class CassetteClient:
+    """
+    Stands in for the Groq client. In record mode calls go to `upstream` and
+    successful completions are saved to the cassette; in replay mode they are
+    served from it without network, delays scaled by `speed`.
+    """
+
+    def __init__(self, cassette, mode, upstream=None, speed=1.0):
+        self.cassette = cassette
+        self.mode = mode
+        self.upstream = upstream
+        self.speed = speed
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        key = GroqCassette.key(params)
+        model = params["model"]
+        if self.mode == 'replay':
+            entry = self.cassette.get(key)
+            if entry is None:
+                raise CassetteMiss(f"No recording for {model} request {key} in {self.cassette.path}")
+            return self._replay_stream(entry) if params.get("stream") else self._replay(entry)
+
+        started = time.perf_counter()
+        response = self.upstream.chat.completions.create(**params)
+        if params.get("stream"):
+            return RecordingStream(response, started, lambda chunks, usage: self.cassette.record(key, model, usage, chunks=chunks))
+        self.cassette.record(
+            key, model, getattr(response, 'usage', None),
+            content=response.choices[0].message.content,
+            latency_ms=round((time.perf_counter() - started) * 1000),
+        )
+        return response
+
+    def _sleep(self, ms):
+        if self.speed > 0 and ms:
+            time.sleep(ms * self.speed / 1000)
+
+    @staticmethod
+    def _usage(entry):
+        prompt_tokens, completion_tokens = entry["usage"]
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def _replay(self, entry):
+        chunks = entry.get("chunks")
+        self._sleep(sum(delay for delay, _ in chunks) if chunks else entry.get("latency_ms"))
+        content = "".join(text for _, text in chunks) if chunks else entry["content"]
+        return ChatCompletion.model_validate({
+            "id": f"cassette-{entry['key']}", "object": "chat.completion", "created": 0, "model": entry["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": self._usage(entry),
+        })
+
+    def _replay_stream(self, entry):
+        chunks = entry.get("chunks") or [[entry.get("latency_ms"), entry["content"]]]
+
+        def chunk(delta, finish_reason=None, **extra):
+            return ChatCompletionChunk.model_validate({
+                "id": f"cassette-{entry['key']}", "object": "chat.completion.chunk", "created": 0, "model": entry["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            })
+
+        for delay_ms, text in chunks:
+            self._sleep(delay_ms)
+            yield chunk({"content": text})
+        yield chunk({}, "stop", x_groq={"id": f"cassette-{entry['key']}", "usage": self._usage(entry)})
+
+
+if GROQ_CASSETTE_MODE == 'replay':
+    client = CassetteClient(GroqCassette(GROQ_CASSETTE_PATH), 'replay', speed=GROQ_CASSETTE_SPEED)
+    print(f"Replaying Groq completions from {GROQ_CASSETTE_PATH}")
+else:
+    try:
+        # Retries are handled by create_completion() so they respect the scheduler and breakers
+        client = Groq(max_retries=0)
+    except Exception as e:
+        print(f"Error initializing Groq client: {e}")
+        client = None
+    if client and GROQ_CASSETTE_MODE == 'record':
+        client = CassetteClient(GroqCassette(GROQ_CASSETTE_PATH), 'record', upstream=client)
+        print(f"Recording Groq completions to {GROQ_CASSETTE_PATH}")
+
+# Shared, bounded pool for fanning out independent agent calls
+AGENT_MAX_WORKERS = int(os.getenv('AURA_AGENT_MAX_WORKERS', '8'))
+AGENT_TIMEOUT = float(os.getenv('AURA_AGENT_TIMEOUT', '30'))
+MAX_VARIANTS = int(os.getenv('AURA_MAX_VARIANTS', '4'))
+BATCH_MAX_ITEMS = int(os.getenv('AURA_BATCH_MAX_ITEMS', '1000'))
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix='aura-agent')
+
+# Latency buckets (seconds) shared by every histogram
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Minimal in-process Prometheus registry: labelled counters and fixed-bucket
+    histograms aggregated under one lock, rendered in text exposition format.
+    Declaring a family is optional; undeclared names are exported untyped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+        self._counters = defaultdict(int)
+        self._histograms = {}
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        self._families[name] = ("counter", help_text, None)
+
+    def histogram(self, name, help_text, buckets=METRIC_BUCKETS):
+        self._families[name] = ("histogram", help_text, buckets)
+
+    def collector(self, func):
+        """
+        Registers func() -> [(name, type, help, [(labels, value)])], read at scrape time.
+        """
+        self._collectors.append(func)
+        return func
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self._families[name][2]
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @staticmethod
+    def _labels(labels, **extra):
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+    @staticmethod
+    def _value(value):
+        """
+        Exposition text for a sample: integers verbatim, floats at full precision.
+        """
+        if isinstance(value, int):
+            return str(int(value))
+        value = float(value)
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(b), s, c) for key, (b, s, c) in self._histograms.items()}
+        by_name = defaultdict(list)
+        for (name, labels), value in counters.items():
+            by_name[name].append(("counter", labels, value))
+        for (name, labels), series in histograms.items():
+            by_name[name].append(("histogram", labels, series))
+        for name in sorted(by_name):
+            kind, help_text, buckets = self._families.get(name, ("untyped", "", None))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for series_kind, labels, value in sorted(by_name[name], key=lambda item: item[1]):
+                if series_kind == "counter":
+                    lines.append(f"{name}{self._labels(labels)} {self._value(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{self._labels(labels, le=f'{bound:g}')} {cumulative}")
+                lines.append(f"{name}_bucket{self._labels(labels, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{self._labels(labels)} {self._value(total)}")
+                lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for collect in self._collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{self._labels(sorted(labels.items()))} {self._value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.counter("aura_http_requests_total", "HTTP requests by route, method and status.")
+metrics.histogram("aura_http_request_duration_seconds", "HTTP request duration by route, including streamed bodies.")
+metrics.histogram("aura_upstream_request_duration_seconds", "Groq completion latency by model (full response or stream).")
+metrics.histogram("aura_upstream_ttft_seconds", "Groq stream time to first token by model and task.")
+metrics.histogram("aura_upstream_tokens_per_second", "Groq stream generation rate after the first token, by model and task.", RATE_BUCKETS)
+metrics.counter("aura_upstream_errors_total", "Failed Groq attempts by model and error type.")
+metrics.counter("aura_llm_tokens_total", "LLM tokens by model, task and kind (prompt/completion).")
+metrics.histogram("aura_scheduler_wait_seconds", "Time LLM calls spent queued in the scheduler, by priority.")
+
+
+# Per-request tracing: spans feed Server-Timing headers and JSON log lines
+TRACING = os.getenv('AURA_TRACING', '1') != '0'
+TRACE_LOG = os.getenv('AURA_TRACE_LOG', '0') == '1'
+ADMIN_TOKEN = os.getenv('AURA_ADMIN_TOKEN', '')
+PROFILE_SAMPLE = float(os.getenv('AURA_PROFILE_SAMPLE', '1.0'))
+PROFILE_DIR = os.getenv('AURA_PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+
+trace_logger = logging.getLogger('aura.trace')
+if TRACE_LOG:
+    _trace_handler = logging.StreamHandler()
+    _trace_handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(_trace_handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+current_trace = contextvars.ContextVar('aura_trace', default=None)
+_SERVER_TIMING_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class Trace:
+    """
+    Spans recorded for one request. Agent and upstream calls made on executor
+    threads report here too, because submissions carry the request's context.
+    """
+    __slots__ = ("id", "started", "spans", "_lock")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, started, ended):
+        with self._lock:
+            self.spans.append((name, started - self.started, ended - started))
+
+    def server_timing(self):
+        with self._lock:
+            spans = list(self.spans)
+        entries = [f"{_SERVER_TIMING_NAME_RE.sub('_', name)};dur={duration * 1000:.1f}" for name, _, duration in spans]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self):
+        with self._lock:
+            return [
+                {"name": name, "start_ms": round(offset * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                for name, offset, duration in self.spans
+            ]
+
+
+def record_span(name, started):
+    """
+    Records a span that began at perf_counter() `started` and ends now.
+    A no-op when the request is not traced.
+    """
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, started, time.perf_counter())
+
+
+@contextmanager
+def span(name):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter())
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit() that carries the caller's context (and so its trace).
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# Outbound LLM call priorities: lower runs first when Groq capacity is contended
+PRIORITY_INTERACTIVE = 0  # streamed /generate and /chat
+PRIORITY_ANALYSIS = 1     # single Lab / SEO / psychology analyses
+PRIORITY_BATCH = 2        # background and bulk work
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_ANALYSIS: "analysis", PRIORITY_BATCH: "batch"}
+
+# Per-model Groq limits; "default" applies to models not listed
+GROQ_RATE_LIMITS = {
+    "default": {"rpm": 30, "tpm": 12000},
+    "groq/compound": {"rpm": 30, "tpm": 70000},
+    "llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000},
+    **json.loads(os.getenv('AURA_GROQ_RATE_LIMITS', '{}')),
+}
+# Longest a call may wait in the scheduler queue, per priority
+SCHEDULER_DEADLINES = {
+    PRIORITY_INTERACTIVE: float(os.getenv('AURA_SCHEDULER_INTERACTIVE_DEADLINE', '15')),
+    PRIORITY_ANALYSIS: float(os.getenv('AURA_SCHEDULER_ANALYSIS_DEADLINE', '45')),
+    PRIORITY_BATCH: float(os.getenv('AURA_SCHEDULER_BATCH_DEADLINE', '600')),
+}
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token) used for budgeting.
+    """
+    return len(text) // 4 + 1
+
+
+class SchedulerTimeout(RuntimeError):
+    """
+    Raised when an LLM call could not be admitted before its queue deadline.
+    """
+
+
+class TokenBucket:
+    """
+    Continuous-refill bucket holding up to `per_minute` units.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.stamp = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, amount):
+        """
+        Seconds until `amount` is available (amount is capped at capacity).
+        """
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """
+    Admits every outbound Groq call through per-model request/token buckets
+    and a global in-flight cap. Waiting calls are granted strictly by
+    (priority, arrival), so interactive streams overtake Lab analyses, and
+    both overtake batch work. A call that cannot start before its deadline
+    raises SchedulerTimeout instead of queueing forever.
+    """
+
+    def __init__(self, limits, max_in_flight, deadlines):
+        self.limits = limits
+        self.max_in_flight = max_in_flight
+        self.deadlines = deadlines
+        self.in_flight = 0
+        self._buckets = {}
+        self._waiting = []  # [priority, seq, model, tokens]
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.stats = defaultdict(lambda: {"granted": 0, "timed_out": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0})
+
+    def _buckets_for(self, model):
+        if model not in self._buckets:
+            limit = self.limits.get(model, self.limits["default"])
+            self._buckets[model] = (TokenBucket(limit["rpm"]), TokenBucket(limit["tpm"]))
+        return self._buckets[model]
+
+    def _delay(self, model, tokens, now):
+        requests, token_bucket = self._buckets_for(model)
+        requests.refill(now)
+        token_bucket.refill(now)
+        return max(requests.wait_time(1), token_bucket.wait_time(tokens))
+
+    def acquire(self, model, tokens, priority=PRIORITY_ANALYSIS, deadline=None):
+        """
+        Blocks until the call may start; returns the time spent queued in ms.
+        """
+        started = time.monotonic()
+        expires = started + (deadline if deadline is not None else self.deadlines[priority])
+        with self._cond:
+            self._seq += 1
+            waiter = [priority, self._seq, model, tokens]
+            self._waiting.append(waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._delay(model, tokens, now)
+                    # Only the best-ranked waiter that could start right now is admitted
+                    ahead = any(
+                        other[:2] < waiter[:2] and self._delay(other[2], other[3], now) == 0
+                        for other in self._waiting
+                    )
+                    if delay == 0 and not ahead and self.in_flight < self.max_in_flight:
+                        break
+                    if now >= expires:
+                        self.stats[PRIORITY_NAMES[priority]]["timed_out"] += 1
+                        metrics.inc("aura_upstream_errors_total", model=model, type="SchedulerTimeout")
+                        raise SchedulerTimeout(f"{model} call not admitted within {expires - started:.1f}s")
+                    self._cond.wait(min(expires - now, delay or 1.0))
+                requests, token_bucket = self._buckets_for(model)
+                requests.take(1)
+                token_bucket.take(tokens)
+                self.in_flight += 1
+            finally:
+                self._waiting.remove(waiter)
+                self._cond.notify_all()
+            waited_ms = (time.monotonic() - started) * 1000
+            metrics.observe("aura_scheduler_wait_seconds", waited_ms / 1000, priority=PRIORITY_NAMES[priority])
+            stats = self.stats[PRIORITY_NAMES[priority]]
+            stats["granted"] += 1
+            stats["wait_ms_total"] += waited_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], waited_ms)
+            return waited_ms
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            now = time.monotonic()
+            depth = defaultdict(int)
+            for priority, _, _, _ in self._waiting:
+                depth[PRIORITY_NAMES[priority]] += 1
+            buckets = {}
+            for model, (requests, token_bucket) in self._buckets.items():
+                requests.refill(now)
+                token_bucket.refill(now)
+                buckets[model] = {"requests_available": round(requests.level, 1), "tokens_available": round(token_bucket.level)}
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": dict(depth),
+                "priorities": {
+                    name: {
+                        "granted": counts["granted"],
+                        "timed_out": counts["timed_out"],
+                        "wait_ms_avg": round(counts["wait_ms_total"] / counts["granted"], 1) if counts["granted"] else 0.0,
+                        "wait_ms_max": round(counts["wait_ms_max"], 1),
+                    }
+                    for name, counts in self.stats.items()
+                },
+                "buckets": buckets,
+            }
+
+
+llm_scheduler = LLMScheduler(
+    GROQ_RATE_LIMITS,
+    max_in_flight=int(os.getenv('AURA_GROQ_MAX_IN_FLIGHT', '16')),
+    deadlines=SCHEDULER_DEADLINES,
+)
+
+
+# Task-aware model routing: tasks map to tiers, tiers map to models
+MODEL_TIERS = {
+    "fast": "llama-3.1-8b-instant",
+    "balanced": "llama-3.3-70b-versatile",
+    "quality": "llama-3.3-70b-versatile",
+    "search": "groq/compound",
+    **json.loads(os.getenv('AURA_MODEL_TIERS', '{}')),
+}
+TASK_ROUTES = {
+    "short_story": "balanced",
+    "product_story": "quality",
+    "full_story": "quality",
+    "variant": "quality",
+    "chat": "quality",
+    "chat_summary": "fast",
+    "social_caption": "fast",
+    "seo_rewrite": "balanced",
+    "analysis": "balanced",
+    "analysis_json": "balanced",
+    "synthesis": "quality",
+    "notes_search": "search",
+    "market_trends": "search",
+    **json.loads(os.getenv('AURA_TASK_ROUTES', '{}')),
+}
+# USD per million (input, output) tokens, for cost reporting only
+MODEL_PRICING = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    **{model: tuple(price) for model, price in json.loads(os.getenv('AURA_MODEL_PRICING', '{}')).items()},
+}
+
+
+class ModelRouter:
+    """
+    Resolves a task to a model through its tier, honouring a per-request
+    override (a tier name or one of the tiers' models), and accumulates
+    latency, token usage and estimated cost per task and model.
+    """
+
+    def __init__(self, tiers, routes, pricing):
+        self.tiers = tiers
+        self.routes = routes
+        self.pricing = pricing
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"calls": 0, "errors": 0, "latency_ms_total": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+
+    def model(self, task, override=None):
+        if override in self.tiers:
+            return self.tiers[override]
+        if override in self.tiers.values():
+            return override
+        if override:
+            print(f"Ignoring unknown model override '{override}' for {task}")
+        return self.tiers[self.routes.get(task, "quality")]
+
+    def record(self, task, model, elapsed, prompt_tokens=0, completion_tokens=0, error=False):
+        input_price, output_price = self.pricing.get(model, (0.0, 0.0))
+        with self._lock:
+            stats = self.stats[(task or "unrouted", model)]
+            stats["calls"] += 1
+            stats["errors"] += error
+            stats["latency_ms_total"] += elapsed * 1000
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["cost_usd"] += (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+    def snapshot(self):
+        with self._lock:
+            routes = defaultdict(dict)
+            for (task, model), stats in self.stats.items():
+                routes[task][model] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "latency_ms_avg": round(stats["latency_ms_total"] / stats["calls"], 1),
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "completion_tokens": stats["completion_tokens"],
+                    "cost_usd": round(stats["cost_usd"], 6),
+                }
+            return {"tiers": self.tiers, "routes": self.routes, "usage": routes}
+
+
+model_router = ModelRouter(MODEL_TIERS, TASK_ROUTES, MODEL_PRICING)
+
+
+class ScheduledStream:
+    """
+    Wraps an upstream stream so its scheduler slot is held until it is
+    exhausted or closed. `first` is a chunk already read from the stream;
+    `on_close(chars, usage)` receives the streamed text length and any usage
+    block the upstream sent.
+    """
+
+    def __init__(self, stream_response, release, first=None, on_close=None):
+        self._stream = stream_response
+        self._release = release
+        self._first = first
+        self._on_close = on_close
+        self.chars = 0
+        self.usage = None
+
+    def _observe(self, chunk):
+        if chunk.choices and chunk.choices[0].delta.content:
+            self.chars += len(chunk.choices[0].delta.content)
+        x_groq = getattr(chunk, 'x_groq', None)
+        self.usage = getattr(x_groq, 'usage', None) or getattr(chunk, 'usage', None) or self.usage
+
+    def __iter__(self):
+        try:
+            if self._first is not None:
+                self._observe(self._first)
+                yield self._first
+            for chunk in self._stream:
+                self._observe(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        release, self._release = self._release, None
+        if release:
+            release()
+            close_upstream(self._stream)
+            if self._on_close:
+                self._on_close(self.chars, self.usage)
+
+
+# Retry and circuit-breaker policy for upstream Groq calls
+GROQ_CALL_TIMEOUT = float(os.getenv('AURA_GROQ_CALL_TIMEOUT', '60'))
+GROQ_MAX_RETRIES = int(os.getenv('AURA_GROQ_MAX_RETRIES', '3'))
+GROQ_BACKOFF_BASE = float(os.getenv('AURA_GROQ_BACKOFF_BASE', '0.5'))
+GROQ_BACKOFF_MAX = float(os.getenv('AURA_GROQ_BACKOFF_MAX', '8'))
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised without calling Groq while a model's circuit breaker is open.
+    """
+
+
+class CallCancelled(RuntimeError):
+    """
+    Raised by a completion that another thread abandoned through its UpstreamCancel.
+    """
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker: opens after `threshold` consecutive transient failures,
+    fails fast for `cooldown` seconds, then lets one trial call through
+    (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        """
+        Returns "closed" or "trial" (the one half-open call) when a call may
+        go ahead, None when it should fail fast.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self.trial:
+                self.trial = True
+                return "trial"
+            return None
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+    def release_trial(self):
+        """
+        Hands back a half-open trial that ended without an upstream verdict
+        (queue timeout or cancellation), so the next call can take it.
+        """
+        with self._lock:
+            self.trial = False
+
+
+circuit_breakers = defaultdict(lambda: CircuitBreaker(
+    threshold=int(os.getenv('AURA_GROQ_BREAKER_THRESHOLD', '5')),
+    cooldown=float(os.getenv('AURA_GROQ_BREAKER_COOLDOWN', '30')),
+))
+resilience_stats = defaultdict(lambda: {"calls": 0, "retries": 0, "failures": 0, "rejected": 0})
+resilience_stats_lock = threading.Lock()
+
+
+def _is_transient(error):
+    """
+    429s, 5xx, timeouts and connection errors are worth retrying; other 4xx are not.
+    """
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    return isinstance(error, groq.APIStatusError) and (error.status_code in (408, 409, 429) or error.status_code >= 500)
+
+
+def _retry_after(error):
+    """
+    Seconds the upstream asked us to wait (Retry-After / retry-after-ms), if any.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    return None
+
+
+def _record_resilience(model, outcome):
+    with resilience_stats_lock:
+        resilience_stats[model][outcome] += 1
+
+
+def create_completion(priority=PRIORITY_ANALYSIS, deadline=None, timeout=GROQ_CALL_TIMEOUT, task=None, cancel=None, **params):
+    """
+    The single entry point for Groq chat completions.
+    Each attempt waits for a scheduler slot, charging the prompt estimate plus
+    the declared `max_tokens` against the model's token bucket. Transient
+    failures are retried with jittered exponential backoff (honouring
+    Retry-After) until `timeout` seconds have passed in total. A model whose
+    breaker is open fails fast with CircuitOpenError. Streams are only retried
+    until their first chunk has been read, so callers never see replayed tokens.
+    Latency and token usage are recorded against `task` in the model router.
+    Setting `cancel` (an UpstreamCancel) lets another thread abandon the call,
+    even while it waits for the first chunk; it then raises CallCancelled.
+    """
+    model = params["model"]
+    prompt = "".join(str(m.get("content") or "") for m in params.get("messages", []))
+    prompt_tokens = estimate_tokens(prompt)
+    tokens = prompt_tokens + params.get("max_tokens", 1024)
+    breaker = circuit_breakers[model]
+    started = time.monotonic()
+    expires = started + timeout
+    first_token_at = None
+    _record_resilience(model, "calls")
+
+    def record(elapsed, used_prompt_tokens, completion_tokens):
+        model_router.record(task, model, elapsed, used_prompt_tokens, completion_tokens)
+        metrics.observe("aura_upstream_request_duration_seconds", elapsed, model=model)
+        metrics.inc("aura_llm_tokens_total", used_prompt_tokens, model=model, task=task or "unrouted", kind="prompt")
+        metrics.inc("aura_llm_tokens_total", completion_tokens, model=model, task=task or "unrouted", kind="completion")
+
+    def record_stream(chars, usage):
+        elapsed = time.monotonic() - started
+        completion_tokens = getattr(usage, 'completion_tokens', None) or chars // 4
+        record(elapsed, getattr(usage, 'prompt_tokens', None) or prompt_tokens, completion_tokens)
+        if first_token_at and completion_tokens and elapsed > first_token_at:
+            metrics.observe("aura_upstream_tokens_per_second", completion_tokens / (elapsed - first_token_at), model=model, task=task or "unrouted")
+
+    for attempt in range(GROQ_MAX_RETRIES + 1):
+        admission = breaker.allow()
+        if not admission:
+            _record_resilience(model, "rejected")
+            metrics.inc("aura_upstream_errors_total", model=model, type="CircuitOpenError")
+            raise CircuitOpenError(f"{model} is temporarily unavailable (circuit open)")
+        remaining = expires - time.monotonic()
+        queued = time.perf_counter()
+        # The priority's queue deadline still applies within the call's overall timeout
+        queue_deadline = deadline if deadline is not None else llm_scheduler.deadlines[priority]
+        try:
+            llm_scheduler.acquire(model, tokens, priority, min(queue_deadline, remaining))
+        except BaseException:
+            if admission == "trial":
+                breaker.release_trial()
+            raise
+        record_span(f"{task or model}.queue", queued)
+        if cancel is not None and cancel.is_set():
+            llm_scheduler.release()
+            if admission == "trial":
+                breaker.release_trial()
+            raise CallCancelled(f"{model} call was cancelled")
+        called = time.perf_counter()
+        response = None
+        try:
+            response = client.chat.completions.create(timeout=max(expires - time.monotonic(), 1.0), **params)
+            if cancel is not None:
+                cancel.attach(response)
+            if params.get("stream"):
+                first = next(iter(response), None)
+                record_span(f"{task or model}.ttft", called)
+                first_token_at = time.monotonic() - started
+                metrics.observe("aura_upstream_ttft_seconds", first_token_at, model=model, task=task or "unrouted")
+                breaker.success()
+                return ScheduledStream(response, llm_scheduler.release, first, record_stream)
+        except Exception as e:
+            if response is not None:
+                close_upstream(response)
+            llm_scheduler.release()
+            if cancel is not None and cancel.is_set():
+                # Abandoned by the caller: says nothing about the upstream and is never retried
+                if admission == "trial":
+                    breaker.release_trial()
+                raise CallCancelled(f"{model} call was cancelled") from e
+            metrics.inc("aura_upstream_errors_total", model=model, type=type(e).__name__)
+            if not _is_transient(e):
+                # Says nothing about the upstream's health either way, so a
+                # half-open trial is handed back without closing the breaker
+                if admission == "trial":
+                    breaker.release_trial()
+                model_router.record(task, model, time.monotonic() - started, error=True)
+                raise
+            breaker.failure()
+            _record_resilience(model, "failures")
+            backoff = random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * 2 ** attempt))
+            delay = max(_retry_after(e) or 0, backoff)
+            if attempt == GROQ_MAX_RETRIES or time.monotonic() + delay >= expires:
+                model_router.record(task, model, time.monotonic() - started, error=True)
+                raise
+            print(f"Transient {type(e).__name__} from {model}; retry {attempt + 1} in {delay:.2f}s")
+            _record_resilience(model, "retries")
+            time.sleep(delay)
+        except BaseException:
+            llm_scheduler.release()
+            if admission == "trial":
+                breaker.release_trial()
+            raise
+        else:
+            # Outside the try, so a failure in the bookkeeping never releases the slot twice
+            llm_scheduler.release()
+            breaker.success()
+            record_span(f"{task or model}.upstream", called)
+            usage = getattr(response, 'usage', None)
+            record(
+                time.monotonic() - started,
+                getattr(usage, 'prompt_tokens', None) or prompt_tokens,
+                getattr(usage, 'completion_tokens', None) or estimate_tokens(response.choices[0].message.content or ""),
+            )
+            return response
+
+
+# Tail-latency hedging: models listed here get a backup request once a call
+# outlives the given percentile of recently observed latencies
+HEDGE_POLICIES = {
+    "groq/compound": {"percentile": 95, "fallback": "groq/compound-mini"},
+    **json.loads(os.getenv('AURA_HEDGE_POLICIES', '{}')),
+}
+HEDGE_BUDGET = float(os.getenv('AURA_HEDGE_BUDGET', '0.05'))
+# Each hedged call holds a worker per leg while it queues or streams, so size
+# the pool to keep every in-flight slot usable by a primary and its backup
+hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('AURA_HEDGE_WORKERS', str(2 * llm_scheduler.max_in_flight))),
+    thread_name_prefix='aura-hedge',
+)
+
+
+class HedgePolicy:
+    """
+    Tracks recent latencies per model and rations backup requests.
+    Every primary call earns `budget` hedge credits (capped at `burst`) and a
+    hedge spends one, so hedges stay at roughly `budget` of total calls.
+    """
+
+    def __init__(self, policies, budget, window=200, min_samples=20, burst=5):
+        self.policies = policies
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self.credits = float(burst)
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"calls": 0, "hedged": 0, "backup_won": 0, "budget_denied": 0})
+
+    def threshold(self, model):
+        """
+        Seconds after which `model` calls should be hedged, or None.
+        """
+        policy = self.policies.get(model)
+        with self._lock:
+            samples = sorted(self._latencies[model])
+        if not policy or len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * policy["percentile"] / 100))]
+
+    def observe(self, model, seconds):
+        with self._lock:
+            self._latencies[model].append(seconds)
+
+    def start(self, model):
+        with self._lock:
+            self.stats[model]["calls"] += 1
+            self.credits = min(self.burst, self.credits + self.budget)
+
+    def try_hedge(self, model):
+        with self._lock:
+            if self.credits < 1:
+                self.stats[model]["budget_denied"] += 1
+                return False
+            self.credits -= 1
+            self.stats[model]["hedged"] += 1
+            return True
+
+    def backup_won(self, model):
+        with self._lock:
+            self.stats[model]["backup_won"] += 1
+
+    def snapshot(self):
+        thresholds = {model: self.threshold(model) for model in self.policies}
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "credits": round(self.credits, 2),
+                "models": {
+                    model: {
+                        **self.stats[model],
+                        "threshold_ms": round(thresholds[model] * 1000) if thresholds[model] else None,
+                        "fallback": policy.get("fallback", model),
+                    }
+                    for model, policy in self.policies.items()
+                },
+            }
+
+
+hedging = HedgePolicy(HEDGE_POLICIES, HEDGE_BUDGET)
+
+
+class UpstreamCancel:
+    """
+    Abandons completions running on other threads: cancel() aborts every
+    upstream response attached so far, and any attached afterwards.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._responses = []
+        self._lock = threading.Lock()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def attach(self, response):
+        with self._lock:
+            if not self._event.is_set():
+                self._responses.append(response)
+                return
+        abort_upstream(response)
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            responses, self._responses = self._responses, []
+        for response in responses:
+            abort_upstream(response)
+
+
+def _streamed_text(cancel, priority, timeout, **params):
+    """
+    Runs a completion as a stream so it can be abandoned at any point:
+    returns the full text, or None if `cancel` was set first. Only calls that
+    ran to completion feed the model's hedging latencies.
+    """
+    started = time.monotonic()
+    stream_response = create_completion(priority=priority, timeout=timeout, cancel=cancel, stream=True, **params)
+    parts = []
+    try:
+        for chunk in stream_response:
+            if cancel.is_set():
+                return None
+            part = chunk.choices[0].delta.content if chunk.choices else None
+            if part:
+                parts.append(part)
+    finally:
+        close_upstream(stream_response)
+    if cancel.is_set():
+        return None
+    hedging.observe(params["model"], time.monotonic() - started)
+    return "".join(parts)
+
+
+def complete_text(priority=PRIORITY_ANALYSIS, timeout=GROQ_CALL_TIMEOUT, **params):
+    """
+    Returns a completion's stripped text. For models with a hedge policy, a
+    backup request (to the policy's fallback model) is fired once the primary
+    outlives the model's latency percentile and hedge budget remains. The
+    first successful answer wins and the other request is aborted at once,
+    whether it is still waiting for its first chunk or already streaming.
+    """
+    model = params["model"]
+    if model not in hedging.policies:
+        response = create_completion(priority=priority, timeout=timeout, **params)
+        return response.choices[0].message.content.strip()
+
+    threshold = hedging.threshold(model)
+    hedging.start(model)
+    cancel = UpstreamCancel()
+    primary = submit_in_context(hedge_executor, _streamed_text, cancel, priority, timeout, **params)
+    pending = {primary}
+    try:
+        if threshold is not None:
+            done, _ = wait(pending, timeout=threshold)
+            if not done and hedging.try_hedge(model):
+                backup_model = hedging.policies[model].get("fallback", model)
+                print(f"Hedging {model} call after {threshold * 1000:.0f}ms with {backup_model}")
+                pending.add(submit_in_context(
+                    hedge_executor, _streamed_text, cancel, priority, timeout, **{**params, "model": backup_model}
+                ))
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not primary:
+                    hedging.backup_won(model)
+                return text.strip()
+        raise error
+    finally:
+        cancel.cancel()
+
+
+def run_agent(model, messages, temperature, max_tokens, timeout=AGENT_TIMEOUT, priority=PRIORITY_ANALYSIS, task=None):
+    """
+    Runs a single blocking agent completion and returns its stripped text.
+    """
+    return complete_text(
+        priority=priority,
+        task=task,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+    )
+
+
+def iter_agents_concurrently(agents, timeout=AGENT_TIMEOUT):
+    """
+    Fans independent agents out onto the shared executor and yields
+    (name, result, error, elapsed_ms) tuples in completion order.
+    `agents` maps a result name to run_agent keyword arguments. A failing or
+    late agent is reported through `error` instead of aborting the others.
+    """
+    started = time.perf_counter()
+
+    def timed(name, spec):
+        t0 = time.perf_counter()
+        result = run_agent(timeout=timeout, **spec)
+        record_span(f"agent.{name}", t0)
+        return result, (time.perf_counter() - t0) * 1000
+
+    futures = {submit_in_context(agent_executor, timed, name, spec): name for name, spec in agents.items()}
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            pending.discard(future)
+            name = futures[future]
+            try:
+                result, elapsed_ms = future.result()
+                yield name, result, None, round(elapsed_ms)
+            except Exception as e:
+                print(f"Agent '{name}' failed: {e}")
+                yield name, None, str(e) or type(e).__name__, round((time.perf_counter() - started) * 1000)
+    except FuturesTimeoutError:
+        for future in pending:
+            future.cancel()
+            print(f"Agent '{futures[future]}' timed out after {timeout}s")
+            yield futures[future], None, f"Timed out after {timeout}s", round((time.perf_counter() - started) * 1000)
+
+
+def stream_agent(model, messages, temperature, max_tokens, timeout=AGENT_TIMEOUT, priority=PRIORITY_ANALYSIS, task=None, cancel=None):
+    """
+    Streams an agent completion, yielding non-empty text deltas as they arrive.
+    `cancel` (an UpstreamCancel) lets another thread abandon it, see coalesce_tokens().
+    """
+    stream_response = create_completion(
+        priority=priority,
+        task=task,
+        cancel=cancel,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        stream=True,
+    )
+    try:
+        for chunk in stream_response:
+            part = chunk.choices[0].delta.content if chunk.choices else None
+            if part:
+                yield part
+    finally:
+        close_upstream(stream_response)
+
+
+def close_upstream(stream_response):
+    """
+    Releases an upstream Groq stream's HTTP connection, e.g. after the client left.
+    """
+    close = getattr(stream_response, 'close', None)
+    if close:
+        try:
+            close()
+        except Exception as e:
+            print(f"Error closing upstream stream: {e}")
+
+
+def abort_upstream(stream_response):
+    """
+    Closes an upstream stream from another thread. Shutting the socket down
+    first wakes a reader blocked on it, e.g. one still waiting for its first chunk.
+    """
+    http_response = getattr(stream_response, 'response', None)
+    # A finished response's connection may already be back in the pool, serving another call
+    network_stream = None if getattr(http_response, 'is_closed', True) else http_response.extensions.get('network_stream')
+    sock = network_stream.get_extra_info('socket') if network_stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
+    close_upstream(stream_response)
+
+
+# Per-endpoint outcomes of streamed responses; "cancelled" means the client disconnected.
+# "deltas" counts upstream token chunks and "frames" the coalesced writes sent for them.
+stream_stats = defaultdict(lambda: {"completed": 0, "cancelled": 0, "frames_before_cancel": 0, "deltas": 0, "frames": 0, "upstream_cancelled": 0})
+stream_stats_lock = threading.Lock()
+
+# Token deltas are coalesced into frames flushed at max_chars or after max_ms
+STREAM_FRAMING = {
+    'default': {"max_chars": 48, "max_ms": 40},
+    'generate': {"max_chars": 64, "max_ms": 50},
+    'chat': {"max_chars": 32, "max_ms": 30},
+    **json.loads(os.getenv('AURA_STREAM_FRAMING', '{}')),
+}
+STREAM_LOG_SAMPLE = int(os.getenv('AURA_STREAM_LOG_SAMPLE', '50'))
+
+
+def coalesce_tokens(endpoint, parts, cancel=None):
+    """
+    Batches tiny token deltas into frames, flushing once `max_chars` are
+    buffered or `max_ms` have passed since the first buffered delta, so each
+    story costs a few dozen writes instead of thousands. Deltas are read on a
+    helper thread, so a buffered frame still goes out on time while the
+    upstream stalls. If the consumer leaves first, `cancel` (the UpstreamCancel
+    the upstream call was made with) aborts it: that wakes the helper thread,
+    and a call still queued for a scheduler slot is never sent. Frames are
+    logged at DEBUG level, one in STREAM_LOG_SAMPLE.
+    """
+    framing = STREAM_FRAMING.get(endpoint, STREAM_FRAMING['default'])
+    max_chars, max_delay = framing["max_chars"], framing["max_ms"] / 1000
+    arrivals = queue.Queue()
+    stopped = threading.Event()
+    finished = threading.Event()
+
+    def read():
+        try:
+            for part in parts:
+                if stopped.is_set():
+                    break
+                if part:
+                    arrivals.put((part, None))
+            finished.set()
+            arrivals.put((None, None))
+        except Exception as e:
+            finished.set()
+            arrivals.put((None, e))
+        finally:
+            # A consumer that left while a read was blocked is only noticed once it returns
+            close = getattr(parts, 'close', None)
+            if close:
+                close()
+
+    threading.Thread(target=contextvars.copy_context().run, args=(read,), daemon=True, name='aura-coalesce').start()
+    buffer, buffered, since = [], 0, 0.0
+    deltas = frames = 0
+    try:
+        while True:
+            try:
+                part, error = arrivals.get(timeout=max(0.0, since + max_delay - time.monotonic()) if buffer else None)
+            except queue.Empty:
+                part = error = None
+            else:
+                if error is not None:
+                    raise error
+                if part is None:
+                    break
+                deltas += 1
+                if not buffer:
+                    since = time.monotonic()
+                buffer.append(part)
+                buffered += len(part)
+            if buffered >= max_chars or time.monotonic() - since >= max_delay:
+                frame, buffer, buffered = ''.join(buffer), [], 0
+                frames += 1
+                if frames % STREAM_LOG_SAMPLE == 1 and app.logger.isEnabledFor(logging.DEBUG):
+                    app.logger.debug("/%s stream frame %d: %r", endpoint, frames, frame)
+                yield frame
+        if buffer:
+            frames += 1
+            yield ''.join(buffer)
+    finally:
+        stopped.set()
+        if cancel is not None and not finished.is_set():
+            cancel.cancel()
+        with stream_stats_lock:
+            stream_stats[endpoint]["deltas"] += deltas
+            stream_stats[endpoint]["frames"] += frames
+
+
+def streaming_response(endpoint, frames):
+    """
+    Wraps a streaming route's generator in an SSE Response. If the client
+    disconnects mid-stream the generator is closed right away, which releases
+    its upstream Groq stream and frees the worker; the outcome is recorded.
+    """
+    def guarded():
+        sent = 0
+        try:
+            for frame in frames:
+                yield frame
+                sent += 1
+        except GeneratorExit:
+            frames.close()
+            print(f"Client disconnected from /{endpoint} after {sent} frames")
+            with stream_stats_lock:
+                stream_stats[endpoint]["cancelled"] += 1
+                stream_stats[endpoint]["frames_before_cancel"] += sent
+            raise
+        with stream_stats_lock:
+            stream_stats[endpoint]["completed"] += 1
+
+    return Response(stream_with_context(guarded()), content_type='text/event-stream')
+
+
+class Generation:
+    """
+    One resumable generation: its SSE frames are kept in a bounded ring
+    buffer keyed by sequence number so readers can replay from any retained
+    offset and then follow the live upstream stream.
+    """
+
+    def __init__(self, generation_id, max_events):
+        self.id = generation_id
+        self.events = deque(maxlen=max_events)
+        self.next_seq = 0
+        self.done = False
+        self.readers = 0
+        self.updated = time.monotonic()
+        self.cancelled = threading.Event()
+        self.cond = threading.Condition()
+
+    def append(self, frame):
+        with self.cond:
+            self.events.append((self.next_seq, frame))
+            self.next_seq += 1
+            self.updated = time.monotonic()
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.updated = time.monotonic()
+            self.cond.notify_all()
+
+    def follow(self, after_seq, idle_timeout):
+        """
+        Yields (seq, frame) after `after_seq` until the generation completes.
+        Yields (None, None) whenever frames the reader still needed were
+        already evicted, on resume or because a slow reader fell behind.
+        """
+        while True:
+            with self.cond:
+                lost = bool(self.events) and after_seq + 1 < self.events[0][0]
+                if lost:
+                    after_seq = self.events[0][0] - 1
+                pending = [(seq, frame) for seq, frame in self.events if seq > after_seq]
+                if not pending and not lost:
+                    if self.done:
+                        return
+                    self.cond.wait(idle_timeout)
+                    continue
+            if lost:
+                yield None, None
+            for seq, frame in pending:
+                yield seq, frame
+                after_seq = seq
+
+
+class GenerationStore:
+    """
+    Runs story generations detached from the HTTP connection so a client that
+    drops can reconnect with Last-Event-ID instead of regenerating. Memory is
+    bounded by the per-generation ring size, the number of retained
+    generations and a TTL after completion. If no reader is attached for
+    `grace` seconds, the upstream stream is cancelled as before.
+    """
+
+    def __init__(self, max_generations, max_events, ttl, grace, workers):
+        self.max_generations = max_generations
+        self.max_events = max_events
+        self.ttl = ttl
+        self.grace = grace
+        self._generations = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='aura-generation')
+
+    def start(self, endpoint, frames):
+        generation = Generation(uuid.uuid4().hex[:16], self.max_events)
+        with self._lock:
+            self._purge()
+            self._generations[generation.id] = generation
+        submit_in_context(self._executor, self._produce, endpoint, generation, frames)
+        return generation
+
+    def get(self, generation_id):
+        with self._lock:
+            self._purge()
+            return self._generations.get(generation_id)
+
+    def resume_point(self, last_event_id):
+        """
+        Parses a `<generation id>:<seq>` Last-Event-ID into (generation, seq).
+        """
+        generation_id, _, seq = (last_event_id or '').partition(':')
+        generation = self.get(generation_id) if seq.lstrip('-').isdigit() else None
+        return (generation, max(int(seq), -1)) if generation else (None, -1)
+
+    def reader(self, endpoint, generation, after_seq=-1):
+        """
+        SSE frames for one connection, tagged with `id:` lines for resumption.
+        """
+        with generation.cond:
+            generation.readers += 1
+        try:
+            if after_seq < 0:
+                # Tagged so a client that drops before the first token can still resume from the start
+                yield f"id: {generation.id}:-1\n" + sse_event("generation", {"id": generation.id})
+            for seq, frame in generation.follow(after_seq, self.grace):
+                if seq is None:
+                    yield sse_event("replay_gap", {"id": generation.id, "message": "Some output is no longer buffered."})
+                    continue
+                yield f"id: {generation.id}:{seq}\n" + frame
+        finally:
+            with generation.cond:
+                generation.readers -= 1
+                detached = generation.readers == 0 and not generation.done
+            if detached:
+                timer = threading.Timer(self.grace, self._cancel_if_abandoned, (endpoint, generation))
+                timer.daemon = True
+                timer.start()
+
+    def _produce(self, endpoint, generation, frames):
+        try:
+            for frame in frames:
+                if generation.cancelled.is_set():
+                    break
+                generation.append(frame)
+        except Exception as e:
+            print(f"Error in generation {generation.id}: {e}")
+            print(traceback.format_exc())
+        finally:
+            # Closing the frames generator closes its upstream Groq stream
+            frames.close()
+            generation.finish()
+            if generation.cancelled.is_set():
+                with stream_stats_lock:
+                    stream_stats[endpoint]["upstream_cancelled"] += 1
+
+    def _cancel_if_abandoned(self, endpoint, generation):
+        with generation.cond:
+            abandoned = generation.readers == 0 and not generation.done
+        if abandoned:
+            print(f"No client reattached to generation {generation.id} within {self.grace}s; cancelling upstream")
+            generation.cancelled.set()
+
+    def _purge(self):
+        now = time.monotonic()
+        for generation_id, generation in list(self._generations.items()):
+            if generation.done and now - generation.updated > self.ttl:
+                del self._generations[generation_id]
+        # Over the cap, finished generations go first, then running ones no
+        # client is reading; a generation that still has readers is never cancelled
+        finished = [generation_id for generation_id, g in self._generations.items() if g.done]
+        unread = [generation_id for generation_id, g in self._generations.items() if not g.done and not g.readers]
+        while len(self._generations) > self.max_generations and (finished or unread):
+            evicted = self._generations.pop(finished.pop(0) if finished else unread.pop(0))
+            evicted.cancelled.set()
+
+    def snapshot(self):
+        with self._lock:
+            self._purge()
+            return {
+                "generations": len(self._generations),
+                "running": sum(1 for g in self._generations.values() if not g.done),
+                "buffered_events": sum(len(g.events) for g in self._generations.values()),
+                "max_generations": self.max_generations,
+                "max_events_per_generation": self.max_events,
+            }
+
+
+generations = GenerationStore(
+    max_generations=int(os.getenv('AURA_RESUME_MAX_GENERATIONS', '200')),
+    max_events=int(os.getenv('AURA_RESUME_MAX_EVENTS', '2000')),
+    ttl=float(os.getenv('AURA_RESUME_TTL', '300')),
+    grace=float(os.getenv('AURA_RESUME_GRACE', '20')),
+    workers=int(os.getenv('AURA_GENERATION_WORKERS', '16')),
+)
+
+
+class MarkdownSections:
+    """
+    Incrementally splits streamed Markdown on '###' headings. feed() returns
+    the sections closed by the new text as {index, title, body} dicts;
+    finish() flushes the last one. Leading text before the first heading is
+    its own section when it is not blank.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.count = 0
+        self._start = 0
+
+    def feed(self, part):
+        self.text += part
+        closed = []
+        while True:
+            search_from = self._start + 3 if self.text.startswith('###', self._start) else self._start
+            boundary = self.text.find('###', search_from)
+            if boundary == -1:
+                return closed
+            section = self._section(self.text[self._start:boundary])
+            if section:
+                closed.append(section)
+            self._start = boundary
+
+    def finish(self):
+        section = self._section(self.text[self._start:])
+        self._start = len(self.text)
+        return [section] if section else []
+
+    def _section(self, raw):
+        raw = raw.strip().lstrip('#').strip()
+        if not raw:
+            return None
+        title, _, body = raw.partition('\n')
+        section = {"index": self.count, "title": title.strip(), "body": body.strip()}
+        self.count += 1
+        return section
+
+
+def sse_event(event, data):
+    """
+    Formats one typed server-sent event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iter_multiplexed_streams(streams, endpoint='default', timeout=AGENT_TIMEOUT):
+    """
+    Runs several streaming agents concurrently and yields (name, part, error)
+    tuples as deltas arrive. `part` is None once that stream has finished.
+    Stops the remaining upstream streams if the consumer goes away.
+    """
+    events = queue.Queue()
+    cancelled = threading.Event()
+    upstreams = {name: UpstreamCancel() for name in streams}
+
+    def pump(name, spec):
+        upstream = upstreams[name]
+        parts = coalesce_tokens(endpoint, stream_agent(timeout=timeout, cancel=upstream, **spec), upstream)
+        try:
+            for part in parts:
+                if cancelled.is_set():
+                    return
+                events.put((name, part, None))
+            events.put((name, None, None))
+        except CallCancelled:
+            pass  # the consumer already left
+        except Exception as e:
+            print(f"Stream '{name}' failed: {e}")
+            events.put((name, None, str(e) or type(e).__name__))
+        finally:
+            parts.close()
+
+    for name, spec in streams.items():
+        submit_in_context(agent_executor, pump, name, spec)
+    remaining = set(streams)
+    try:
+        while remaining:
+            try:
+                name, part, error = events.get(timeout=timeout)
+            except queue.Empty:
+                for name in list(remaining):
+                    remaining.discard(name)
+                    upstreams[name].cancel()
+                    yield name, None, f"Timed out after {timeout}s"
+                return
+            if part is None:
+                remaining.discard(name)
+            yield name, part, error
+    finally:
+        cancelled.set()
+        for name in remaining:
+            upstreams[name].cancel()
+
+
+def run_agents_concurrently(agents, timeout=AGENT_TIMEOUT, on_result=None):
+    """
+    Collects iter_agents_concurrently() into (results, errors, timings) dicts.
+    `on_result(name, error, elapsed_ms)` is called as each agent finishes.
+    """
+    results, errors, timings = {}, {}, {}
+    for name, result, error, elapsed_ms in iter_agents_concurrently(agents, timeout):
+        if on_result:
+            on_result(name, error, elapsed_ms)
+        timings[name] = elapsed_ms
+        if error:
+            errors[name] = error
+        else:
+            results[name] = result
+    return results, errors, timings
 
 @app.route('/')
 def home():
@@ -68,36 +1711,745 @@ def dashboard():
     """
     return render_template('dashboard.html')
 
-def get_accurate_notes(fragrance_name):
+def normalize_fragrance_name(name):
+    """
+    Normalizes a fragrance name into a cache/index key: accents, casing,
+    punctuation and repeated whitespace are ignored.
+    """
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    name = re.sub(r"[^\w\s]", ' ', name)
+    return ' '.join(name.split())
+
+
+class NotesCache:
+    """
+    Persistent SQLite cache for web-searched fragrance notes.
+    Entries expire after `ttl` seconds and the least recently used entries are
+    evicted beyond `max_entries`, tracked with an in-memory row count that is
+    re-read from disk only once it crosses the cap. Concurrent lookups for the same fragrance
+    share one upstream call, and hit/miss counters are kept for /notes-cache/stats.
+    """
+
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "key TEXT PRIMARY KEY, name TEXT, notes TEXT, created_at REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS notes_last_used ON notes (last_used)")
+        self._entries = self._db.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def get(self, fragrance_name):
+        key = normalize_fragrance_name(fragrance_name)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT notes, created_at FROM notes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM notes WHERE key = ?", (key,))
+                self._entries -= 1
+                return None
+            self._db.execute("UPDATE notes SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, fragrance_name, notes):
+        key = normalize_fragrance_name(fragrance_name)
+        now = time.time()
+        with self._lock:
+            exists = self._db.execute("SELECT 1 FROM notes WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO notes (key, name, notes, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, fragrance_name, notes, now, now),
+            )
+            if not exists:
+                self._entries += 1
+            if self._entries > self.max_entries:
+                # Other workers may share the file, so recount before evicting
+                self._entries = self._db.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+                overflow = self._entries - self.max_entries
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM notes WHERE key IN (SELECT key FROM notes ORDER BY last_used LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._entries -= overflow
+                    self.stats["evictions"] += overflow
+
+    def get_or_fetch(self, fragrance_name, fetch):
+        """
+        Returns cached notes, or calls fetch(fragrance_name) once per key even when
+        several requests miss at the same time. Empty results are not cached.
+        """
+        key = normalize_fragrance_name(fragrance_name)
+        cached = self.get(fragrance_name)
+
+        with self._lock:
+            if cached is not None:
+                self.stats["hits"] += 1
+                return cached
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = {"done": threading.Event(), "result": None}
+                self.stats["misses"] += 1
+                owner = True
+            else:
+                self.stats["coalesced"] += 1
+                owner = False
+
+        if not owner:
+            waiter["done"].wait()
+            return waiter["result"]
+
+        try:
+            result = fetch(fragrance_name)
+            if result:
+                self.put(fragrance_name, result)
+            waiter["result"] = result
+            return result
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter["done"].set()
+
+    def snapshot(self):
+        with self._lock:
+            entries = self._entries = self._db.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        return {
+            **stats,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hit_ratio": round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else None,
+        }
+
+
+notes_cache = NotesCache(
+    os.getenv('AURA_NOTES_CACHE_PATH', os.path.join(app.instance_path, 'notes_cache.sqlite3')),
+    ttl=float(os.getenv('AURA_NOTES_CACHE_TTL', str(30 * 24 * 3600))),
+    max_entries=int(os.getenv('AURA_NOTES_CACHE_MAX_ENTRIES', '5000')),
+)
+
+
+# Concentration, packaging and "by <brand>" words that don't identify a fragrance
+_CONCENTRATION_RE = re.compile(
+    r"\b(eau de (toilette|parfum|cologne)|extrait( de parfum)?|edt|edp|edc|parfum|cologne|spray|"
+    r"\d+(\.\d+)? ?(ml|oz)|by)\b"
+)
+
+
+def _catalog_key(name):
+    """
+    Index key for a fragrance name: normalized, with concentration words dropped.
+    """
+    key = _CONCENTRATION_RE.sub(' ', normalize_fragrance_name(name))
+    return ' '.join(key.split())
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions
+    and adjacent transpositions), or limit + 1 once it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def _allowed_edits(key):
+    """
+    Typos tolerated for a key of this length: none for very short keys, where
+    one edit is a different name, then one per word-sized chunk.
+    """
+    return 0 if len(key) < 5 else 1 if len(key) < 9 else 2
+
+
+class FragranceIndex:
+    """
+    In-memory fragrance notes catalog with typo-tolerant name matching.
+    Every entry is reachable by its name alone and combined with its brand;
+    exact keys resolve with a dict lookup and everything else falls back to
+    trigram (Dice) similarity over an inverted index. A single typo costs a
+    short name most of its trigrams, so the closest trigram candidates are
+    also rescored by edit distance and accepted within a length-aware budget
+    ("sauvge", "Avnetus" and "Laytn" all resolve).
+    """
+
+    RESCORE_CANDIDATES = 8
+
+    def __init__(self, min_similarity=0.75):
+        self.min_similarity = min_similarity
+        self._entries = []
+        self._exact = {}
+        self._keys = []
+        self._grams = defaultdict(set)
+        self.stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry):
+        index = len(self._entries)
+        self._entries.append(entry)
+        keys = {_catalog_key(entry["name"])}
+        if entry.get("brand"):
+            brand = _catalog_key(entry["brand"])
+            keys |= {f"{brand} {_catalog_key(entry['name'])}", f"{_catalog_key(entry['name'])} {brand}"}
+        for key in keys:
+            if not key:
+                continue
+            self._exact[key] = index
+            key_id = len(self._keys)
+            grams = _trigrams(key)
+            self._keys.append((index, len(grams), key))
+            for gram in grams:
+                self._grams[gram].add(key_id)
+
+    def load(self, path):
+        """
+        Loads a CSV or JSONL catalog; returns the number of entries added.
+        """
+        added = 0
+        for entry in read_notes_catalog(path):
+            self.add(entry)
+            added += 1
+        return added
+
+    def lookup(self, fragrance_name):
+        """
+        Returns the best matching catalog entry, or None when nothing is close enough.
+        """
+        key = _catalog_key(fragrance_name)
+        if key in self._exact:
+            self._count("hits")
+            return self._entries[self._exact[key]]
+
+        grams = _trigrams(key)
+        overlaps = defaultdict(int)
+        for gram in grams:
+            for key_id in self._grams.get(gram, ()):
+                overlaps[key_id] += 1
+        candidates = []
+        for key_id, shared in overlaps.items():
+            index, size, candidate = self._keys[key_id]
+            candidates.append((2 * shared / (len(grams) + size), index, candidate))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        if candidates and candidates[0][0] >= self.min_similarity:
+            self._count("fuzzy_hits")
+            return self._entries[candidates[0][1]]
+
+        limit = _allowed_edits(key)
+        best, best_distance = None, limit + 1
+        for _, index, candidate in candidates[:self.RESCORE_CANDIDATES]:
+            cap = min(limit, _allowed_edits(candidate))
+            distance = _edit_distance(key, candidate, cap)
+            if distance <= cap and distance < best_distance:
+                best, best_distance = index, distance
+        if best is not None:
+            self._count("fuzzy_hits")
+            return self._entries[best]
+        self._count("misses")
+        return None
+
+    def _count(self, outcome):
+        with self._stats_lock:
+            self.stats[outcome] += 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
+def read_notes_catalog(path):
+    """
+    Yields {name, brand, notes} entries from a CSV or JSONL catalog.
+    Accepts separate top/heart/base columns or a single notes column;
+    rows without a name or any notes are skipped.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            row = {(k or '').strip().lower(): (v or '').strip() if isinstance(v, str) else v for k, v in row.items()}
+            name = row.get('name') or row.get('product_name') or row.get('fragrance')
+            layers = [
+                ("Top", row.get('top') or row.get('top_notes')),
+                ("Heart", row.get('heart') or row.get('heart_notes') or row.get('middle') or row.get('middle_notes')),
+                ("Base", row.get('base') or row.get('base_notes')),
+            ]
+            notes = '; '.join(f"{label}: {value}" for label, value in layers if value)
+            notes = notes or row.get('notes') or row.get('key_notes')
+            if name and notes:
+                yield {"name": name, "brand": row.get('brand') or row.get('house') or '', "notes": notes}
+
+
+NOTES_CATALOG_PATH = os.getenv('AURA_NOTES_CATALOG_PATH', os.path.join(app.instance_path, 'fragrance_notes.jsonl'))
+
+fragrance_index = FragranceIndex(float(os.getenv('AURA_NOTES_MATCH_THRESHOLD', '0.75')))
+for _catalog_path in (os.path.join(app.root_path, 'data', 'fragrance_notes.csv'), NOTES_CATALOG_PATH):
+    if os.path.exists(_catalog_path):
+        print(f"Loaded {fragrance_index.load(_catalog_path)} fragrances from {_catalog_path}")
+
+
+@app.cli.command('import-notes')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_notes(path):
+    """
+    Import a CSV/JSONL product catalog into the offline notes index.
+    """
+    entries = list(read_notes_catalog(path))
+    os.makedirs(os.path.dirname(NOTES_CATALOG_PATH), exist_ok=True)
+    with open(NOTES_CATALOG_PATH, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+    click.echo(f"Imported {len(entries)} fragrances into {NOTES_CATALOG_PATH}")
+
+
+def get_accurate_notes(fragrance_name, priority=PRIORITY_INTERACTIVE):
     """
     Uses a web-search enabled model to get accurate notes for a known fragrance.
+    The offline catalog is consulted first; web results are served from the
+    persistent notes cache when available. Bulk callers pass PRIORITY_BATCH
+    so their searches queue behind interactive ones.
     """
+    entry = fragrance_index.lookup(fragrance_name)
+    if entry:
+        print(f"Found notes for '{fragrance_name}' in catalog as '{entry['name']}'")
+        return entry["notes"]
     if not client:
         print("No Groq client available for note retrieval.")
         return "Not specified"
     try:
-        print(f"Searching web for notes of: {fragrance_name}")
-        chat_completion = client.chat.completions.create(
-            model="groq/compound",  # Web-search enabled system
-            messages=[
-                {"role": "system", "content": "You are a fragrance database expert. Return only the exact top, heart, and base notes for a given fragrance."},
-                {"role": "user", "content": f"What are the exact notes for the fragrance '{fragrance_name}'?"}
-            ],
-            temperature=0,
-        )
-        accurate_notes = chat_completion.choices[0].message.content.strip()
-        print(f"Found notes: {accurate_notes}")
+        accurate_notes = notes_cache.get_or_fetch(fragrance_name, lambda name: _search_notes(name, priority))
         return accurate_notes if accurate_notes else "Not specified"
     except Exception as e:
         print(f"Error getting accurate notes: {e}")
         print(traceback.format_exc())
         return "Not specified"
 
+
+def _search_notes(fragrance_name, priority=PRIORITY_INTERACTIVE):
+    """
+    Looks up a fragrance's notes with the web-search model (the notes cache miss path).
+    """
+    print(f"Searching web for notes of: {fragrance_name}")
+    # By default this blocks an interactive /generate, so it is admitted ahead of Lab traffic
+    accurate_notes = complete_text(
+        priority=priority,
+        task="notes_search",
+        model=model_router.model("notes_search"),  # Web-search enabled system
+        messages=[
+            {"role": "system", "content": "You are a fragrance database expert. Return only the exact top, heart, and base notes for a given fragrance."},
+            {"role": "user", "content": f"What are the exact notes for the fragrance '{fragrance_name}'?"}
+        ],
+        temperature=0,
+    )
+    print(f"Found notes: {accurate_notes}")
+    return accurate_notes
+
+
+@app.route('/notes-cache/stats')
+def notes_cache_stats():
+    """
+    Hit/miss counters and size of the persistent notes cache and offline index
+    """
+    return jsonify({**notes_cache.snapshot(), "index": fragrance_index.snapshot()})
+
+
+class MemoryResponseCache:
+    """
+    In-process LRU response cache backend.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteResponseCache:
+    """
+    On-disk response cache backend, shared by every worker process on the host.
+    Beyond `max_entries` the least recently read or written entries are evicted.
+    """
+
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL, last_access REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        if "last_access" not in columns:
+            # Caches written before LRU eviction; their entries count as least recently used
+            self._db.execute("ALTER TABLE responses ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+            overflow = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for deterministic analysis completions.
+    Keys hash (endpoint, model, messages, params), so any prompt change is a
+    new entry. Backends are tried in order and earlier tiers are refilled on a
+    later-tier hit; each endpoint has its own TTL.
+    """
+
+    def __init__(self, backends, ttls):
+        self.backends = backends
+        self.ttls = ttls
+        self._lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+
+    @staticmethod
+    def key(endpoint, **params):
+        payload = json.dumps({"endpoint": endpoint, **params}, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, endpoint, key):
+        for tier, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for upper in self.backends[:tier]:
+                    upper.set(key, value, self.ttls.get(endpoint, 0))
+                self.record(endpoint, "hits")
+                return value
+        self.record(endpoint, "misses")
+        return None
+
+    def set(self, endpoint, key, value):
+        ttl = self.ttls.get(endpoint, 0)
+        if ttl <= 0:
+            return
+        for backend in self.backends:
+            backend.set(key, value, ttl)
+
+    def record(self, endpoint, outcome):
+        with self._lock:
+            self.stats[endpoint][outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "backends": [type(backend).__name__ for backend in self.backends],
+                "ttl_seconds": self.ttls,
+                "endpoints": {endpoint: dict(counts) for endpoint, counts in self.stats.items()},
+            }
+
+
+def _response_cache_backends(names):
+    backends = []
+    for name in filter(None, (n.strip() for n in names.split(','))):
+        if name == 'memory':
+            backends.append(MemoryResponseCache(int(os.getenv('AURA_RESPONSE_CACHE_MEMORY_ENTRIES', '512'))))
+        elif name == 'sqlite':
+            backends.append(SQLiteResponseCache(
+                os.getenv('AURA_RESPONSE_CACHE_PATH', os.path.join(app.instance_path, 'response_cache.sqlite3')),
+                int(os.getenv('AURA_RESPONSE_CACHE_DISK_ENTRIES', '20000')),
+            ))
+        else:
+            print(f"Unknown response cache backend '{name}' ignored")
+    return backends
+
+
+response_cache = ResponseCache(
+    _response_cache_backends(os.getenv('AURA_RESPONSE_CACHE_BACKENDS', 'memory,sqlite')),
+    ttls={
+        'seo-analysis': float(os.getenv('AURA_SEO_CACHE_TTL', str(24 * 3600))),
+        'psychology-score': float(os.getenv('AURA_PSYCHOLOGY_CACHE_TTL', str(24 * 3600))),
+    },
+)
+
+
+def cached_completion(endpoint, bypass=False, **params):
+    """
+    Returns (text, cache_hit) for a completion, serving repeats from the response cache.
+    `bypass` skips the lookup but still refreshes the stored entry.
+    """
+    key = ResponseCache.key(endpoint, **params)
+    if bypass:
+        response_cache.record(endpoint, "bypassed")
+    else:
+        cached = response_cache.get(endpoint, key)
+        if cached is not None:
+            return cached, True
+    completion = create_completion(**params)
+    text = completion.choices[0].message.content.strip()
+    response_cache.set(endpoint, key, text)
+    return text, False
+
+
+def cache_bypassed(data):
+    """
+    True when the caller asked to skip the response cache (body flag or Cache-Control header).
+    """
+    return bool(data.get('no_cache')) or 'no-cache' in request.headers.get('Cache-Control', '')
+
+
+@app.route('/routing/stats')
+def routing_stats():
+    """
+    Task-to-tier routing table plus latency, token usage and estimated cost per task and model
+    """
+    return jsonify(model_router.snapshot())
+
+
+@app.route('/scheduler/stats')
+def scheduler_stats():
+    """
+    Outbound LLM queue depth, wait times per priority, per-model bucket levels,
+    retry / circuit-breaker state and hedging counters
+    """
+    with resilience_stats_lock:
+        upstream = {model: {**counts, "circuit": circuit_breakers[model].state} for model, counts in resilience_stats.items()}
+    cassette = client.cassette.snapshot() if isinstance(client, CassetteClient) else None
+    return jsonify({**llm_scheduler.snapshot(), "upstream": upstream, "hedging": hedging.snapshot(), "cassette": cassette})
+
+
+def is_admin():
+    """
+    True when the request carries the configured admin token.
+    """
+    supplied = request.headers.get('X-Aura-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied, ADMIN_TOKEN)
+
+
+_profile_lock = threading.Lock()
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace = Trace() if TRACING else None
+    current_trace.set(g.trace)
+    g.profiler = None
+    wants_profile = request.headers.get('X-Aura-Profile') == '1' or request.args.get('profile') == '1'
+    # Only one profile at a time: cProfile cannot nest, and admins only
+    if wants_profile and is_admin() and random.random() < PROFILE_SAMPLE and _profile_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Counts every response and times it until the body is fully sent, so
+    streamed routes are measured end to end rather than to their headers.
+    Adds Server-Timing for spans finished so far and, once the body is sent,
+    writes the trace as a JSON log line and saves any requested profile.
+    """
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    started = g.get('request_started', time.perf_counter())
+    trace, profiler = g.get('trace'), g.get('profiler')
+    metrics.inc("aura_http_requests_total", route=route, method=request.method, status=response.status_code)
+    if trace is not None:
+        response.headers['Server-Timing'] = trace.server_timing()
+        response.headers['X-Trace-Id'] = trace.id
+    if profiler is not None:
+        response.headers['X-Aura-Profile'] = trace.id if trace is not None else 'enabled'
+    method, status = request.method, response.status_code
+
+    def on_close():
+        elapsed = time.perf_counter() - started
+        metrics.observe("aura_http_request_duration_seconds", elapsed, route=route)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{trace.id if trace is not None else uuid.uuid4().hex[:16]}.prof")
+            profiler.dump_stats(path)
+            print(f"Saved CPU profile for {method} {route} to {path}")
+        if trace is not None and TRACE_LOG:
+            trace_logger.info(json.dumps({
+                "trace_id": trace.id,
+                "route": route,
+                "method": method,
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "spans": trace.as_dict(),
+            }))
+
+    response.call_on_close(on_close)
+    g.profiler = None  # handed to on_close, which releases _profile_lock
+    return response
+
+
+@app.teardown_request
+def stop_orphaned_profiler(error=None):
+    # after_request is skipped on unhandled errors and may fail before it registers
+    # on_close; either way the profiler is still in g, so stop it and free the lock here
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+
+
+@app.route('/profiles/<trace_id>')
+def profile_report(trace_id):
+    """
+    Admin-only: top functions by cumulative time from a captured request profile
+    """
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(trace_id)}.prof")
+    if not os.path.exists(path):
+        return jsonify({"error": "Profile not found"}), 404
+    report = StringIO()
+    pstats.Stats(path, stream=report).sort_stats('cumulative').print_stats(int(request.args.get('limit', 40)))
+    return Response(report.getvalue(), content_type='text/plain; charset=utf-8')
+
+
+@metrics.collector
+def _state_metrics():
+    """
+    Exports the counters the caches, streams and scheduler already keep.
+    """
+    caches = {
+        "notes": dict(notes_cache.stats),
+        "notes_index": dict(fragrance_index.stats),
+        **{f"response:{endpoint}": dict(counts) for endpoint, counts in list(response_cache.stats.items())},
+    }
+    lookups, ratios = [], []
+    for cache, counts in caches.items():
+        lookups.extend(({"cache": cache, "outcome": outcome}, value) for outcome, value in counts.items())
+        hits = sum(v for k, v in counts.items() if k.endswith("hits") or k == "coalesced")
+        total = hits + counts.get("misses", 0)
+        if total:
+            ratios.append(({"cache": cache}, hits / total))
+    with stream_stats_lock:
+        streams = [
+            ({"endpoint": endpoint, "outcome": outcome}, value)
+            for endpoint, counts in stream_stats.items()
+            for outcome, value in counts.items()
+        ]
+    scheduler = llm_scheduler.snapshot()
+    return [
+        ("aura_cache_events_total", "counter", "Cache lookups and maintenance events by cache and outcome.", lookups),
+        ("aura_cache_hit_ratio", "gauge", "Share of cache lookups served without an upstream call.", ratios),
+        ("aura_stream_events_total", "counter", "Streamed response outcomes and frame counts by endpoint.", streams),
+        ("aura_scheduler_queue_depth", "gauge", "LLM calls waiting for admission, by priority.",
+         [({"priority": name}, scheduler["queue_depth"].get(name, 0)) for name in PRIORITY_NAMES.values()]),
+        ("aura_scheduler_in_flight", "gauge", "LLM calls currently admitted.", [({}, scheduler["in_flight"])]),
+        ("aura_jobs", "gauge", "Retained background jobs by status.",
+         [({"status": status}, count) for status, count in jobs.snapshot()["by_status"].items()]),
+    ]
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus text exposition of request, upstream, token, cache and stream metrics
+    """
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/streams/stats')
+def streams_stats():
+    """
+    Completed vs. client-cancelled streamed responses per endpoint, plus resumable generation buffers
+    """
+    with stream_stats_lock:
+        stats = {endpoint: dict(counts) for endpoint, counts in stream_stats.items()}
+    return jsonify({**stats, "generations": generations.snapshot()})
+
+
+@app.route('/response-cache/stats')
+def response_cache_stats():
+    """
+    Per-endpoint hit/miss counters for the analysis response cache
+    """
+    return jsonify(response_cache.snapshot())
+
+
 @app.route('/generate', methods=['POST'])
 def generate():
     if not client:
         return Response("Groq client not initialized. Please check your API key.", status=500)
 
+    # A reconnecting client resumes its generation instead of paying for a new one
+    generation, after_seq = generations.resume_point(request.headers.get('Last-Event-ID'))
+    if generation:
+        print(f"Resuming generation {generation.id} after event {after_seq}")
+        return streaming_response('generate', generations.reader('generate', generation, after_seq))
+
     # Extract form data and log all received inputs
     use_case = request.form.get('use_case', 'existing')
     product_name = request.form.get('product_name', 'Unnamed Fragrance')
@@ -110,6 +2462,7 @@ def generate():
     seo_keywords = request.form.get('seo_keywords', '')
     tone = request.form.get('tone', 'Poetic & Evocative')
     output_length = request.form.get('output_length', 'product')  # product, full, or short
+    model_tier = request.form.get('model_tier')  # optional tier or model override
 
     print("== Incoming request data ==")
     print("use_case:", use_case)
@@ -123,16 +2476,94 @@ def generate():
     print("seo_keywords:", seo_keywords)
     print("tone:", tone)
     print("output_length:", output_length)
+    print("model_tier:", model_tier)
 
     # Determine key notes robustly
     final_key_notes = key_notes_input
     if use_case == 'existing' and not key_notes_input:
-        final_key_notes = get_accurate_notes(product_name)
+        with span("notes"):
+            final_key_notes = get_accurate_notes(product_name)
     elif not key_notes_input:
         final_key_notes = "Not specified"
 
     print("Final used notes:", final_key_notes)
 
+    prompt_started = time.perf_counter()
+
+    completion = story_completion(
+        product_name, final_key_notes, output_length,
+        use_case=use_case,
+        vibe_keywords=vibe_keywords,
+        target_audience=target_audience,
+        storytelling_angle=storytelling_angle,
+        brand_voice=brand_voice,
+        competitor_text=competitor_text,
+        seo_keywords=seo_keywords,
+        tone=tone,
+        model_tier=model_tier,
+    )
+    record_span("prompt", prompt_started)
+
+    def stream():
+        started = time.perf_counter()
+        first_token_ms = None
+        sections = MarkdownSections()
+        try:
+            upstream = UpstreamCancel()
+            stream_response = create_completion(priority=PRIORITY_INTERACTIVE, stream=True, cancel=upstream, **completion)
+            deltas = (chunk.choices[0].delta.content if chunk.choices else None for chunk in stream_response)
+            try:
+                for part in coalesce_tokens('generate', deltas, upstream):
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - started) * 1000)
+                    yield sse_event("token", {"token": part})
+                    for section in sections.feed(part):
+                        yield sse_event("section", section)
+            finally:
+                # Also runs when the client disconnects, so the upstream stops generating
+                close_upstream(stream_response)
+            for section in sections.finish():
+                yield sse_event("section", section)
+            print(f"Story stream complete: {len(sections.text)} chars, {sections.count} sections in {round((time.perf_counter() - started) * 1000)}ms")
+            if not sections.text.strip():
+                yield sse_event("error", {"message": "No output generated — please check fragrance notes or model input."})
+                return
+            yield sse_event("done", {
+                "word_count": len(_tokenize(sections.text)),
+                "section_count": sections.count,
+                "first_token_ms": first_token_ms,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000),
+            })
+        except Exception as e:
+            print(f"Error during story generation: {e}")
+            print(traceback.format_exc())
+            yield sse_event("error", {"message": "An error occurred during generation. Please check the server logs."})
+
+    generation = generations.start('generate', stream())
+    return streaming_response('generate', generations.reader('generate', generation))
+
+
+@app.route('/generate/stream/<generation_id>')
+def resume_generation(generation_id):
+    """
+    Reattach to a running or recently finished /generate stream.
+    Replays everything after the Last-Event-ID header (or ?last_event_id=) and then follows live output.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or f"{generation_id}:-1"
+    generation, after_seq = generations.resume_point(last_event_id)
+    if not generation or generation.id != generation_id:
+        return jsonify({"error": "Generation not found or expired"}), 404
+    return streaming_response('generate', generations.reader('generate', generation, after_seq))
+
+
+def story_completion(product_name, key_notes, output_length='product', use_case='existing',
+                     vibe_keywords='Elegant and mysterious', target_audience='A discerning individual',
+                     storytelling_angle='An elegant evening', brand_voice='', competitor_text='',
+                     seo_keywords='', tone='Poetic & Evocative', model_tier=None):
+    """
+    Builds the completion params (task, model, messages, sampling) for one
+    story, shared by /generate and the catalog batch pipeline.
+    """
     # Configure output specifications based on selected length
     if output_length == 'short':
         length_instruction = """
@@ -183,6 +2614,9 @@ Output Markdown sections with '###' headings:
 VOICE: Luxury brand storytelling meets e-commerce clarity. Use keywords naturally within evocative sentences. Short paragraphs for scannability, but never sacrifice beauty for SEO. Think Byredo, Le Labo, Diptyque - sophisticated yet accessible."""
         max_tokens = 1024
 
+    task = {"short": "short_story", "full": "full_story"}.get(output_length, "product_story")
+    model = model_router.model(task, model_tier)
+
     # Compose the system prompt
     system_prompt = f"""
 # ROLE
@@ -202,7 +2636,7 @@ Make readers **feel the fragrance before they smell it**. Create desire through
 # INPUT VARIABLES
 - Fragrance Name: {product_name}
 - Use Case: {"Describing a new creation" if use_case == "new" else "Re-interpreting an existing fragrance"}
-- Olfactory Notes: {final_key_notes}
+- Olfactory Notes: {key_notes}
 - Desired Vibe: {vibe_keywords}
 - Wearer's Persona: {target_audience}
 - Narrative Scene: {storytelling_angle}
@@ -217,59 +2651,506 @@ Make readers **feel the fragrance before they smell it**. Create desire through
 - Match the specified tone while maintaining sophisticated brand voice
 - Create content that's scannable (headings, short paragraphs) yet magnetic
 """
-    user_prompt = "Craft the olfactory story."
+    return {
+        "task": task,
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "Craft the olfactory story."}
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+        "top_p": 1,
+        "stop": None,
+    }
+
+
+# Bulk catalog generation: CLI (`flask generate-batch`) and POST /generate/batch
+BATCH_OUTPUT_DIR = os.getenv('AURA_BATCH_OUTPUT_DIR', os.path.join(app.instance_path, 'batches'))
+BATCH_CONCURRENCY = int(os.getenv('AURA_BATCH_CONCURRENCY', '4'))
+BATCH_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+active_batches = set()
+active_batches_lock = threading.Lock()
+
+
+class BatchInProgress(RuntimeError):
+    """
+    Raised when a batch output file is already being written by another run.
+    """
 
-    def stream():
-        try:
-            stream_response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=max_tokens,
-                top_p=1,
-                stop=None,
-                stream=True,
-            )
-            empty = True
-            for chunk in stream_response:
-                part = chunk.choices[0].delta.content or ""
-                if part.strip():
-                    empty = False
-                print("Story stream chunk:", repr(part))
-                yield part
-            if empty:
-                yield "\n### Error\nNo output generated — please check fragrance notes or model input."
-        except Exception as e:
-            print(f"Error during story generation: {e}")
-            print(traceback.format_exc())
-            yield "An error occurred during generation. Please check the server logs."
 
-    return Response(stream_with_context(stream()), content_type='text/event-stream')
+def story_batch_items(rows):
+    """
+    Normalizes catalog rows into batch items. Each item's `row` key (the
+    `sku` or `id` column, else the 1-based row number) identifies it in the
+    output and checkpoint.
+    """
+    items = []
+    for number, row in enumerate(rows, 1):
+        row = {(k or '').strip().lower(): v.strip() if isinstance(v, str) else v for k, v in row.items()}
+        items.append({
+            "row": str(row.get('sku') or row.get('id') or number),
+            "product_name": row.get('product_name') or row.get('name') or row.get('fragrance') or '',
+            "key_notes": row.get('notes') or row.get('key_notes') or '',
+            "vibe_keywords": row.get('vibe') or row.get('vibe_keywords') or '',
+            "target_audience": row.get('audience') or row.get('target_audience') or '',
+            "tone": row.get('tone') or '',
+            "use_case": row.get('use_case') or '',
+            "output_length": row.get('output_length') or 'product',
+        })
+    return items
+
+
+def read_catalog_rows(f, jsonl=False):
+    """
+    Reads raw row dicts from a CSV (default) or JSONL catalog file object.
+    """
+    if jsonl:
+        return [json.loads(line) for line in f if line.strip()]
+    return list(csv.DictReader(f))
+
+
+def batch_checkpoint(output_path):
+    """
+    Row keys already recorded as succeeded in a batch output file. The output
+    is its own checkpoint; a line torn by a crash is ignored.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "succeeded":
+                completed.add(str(record.get("row")))
+    return completed
+
+
+def generate_batch_row(item, model_tier=None):
+    """
+    Generates one catalog row's story at batch priority, resolving missing
+    notes through the notes lookup. Returns the output record; failures are
+    recorded rather than raised.
+    """
+    started = time.perf_counter()
+    record = {"row": item["row"], "product_name": item["product_name"], "output_length": item["output_length"]}
+    try:
+        if not item["product_name"]:
+            raise ValueError("missing product_name")
+        notes = item["key_notes"] or get_accurate_notes(item["product_name"], priority=PRIORITY_BATCH)
+        record["key_notes"] = notes
+        # The lookup answers "Not specified" when neither the catalog nor web search found notes
+        record["notes_resolved"] = not item["key_notes"] and notes != "Not specified"
+        record["notes_fallback"] = not item["key_notes"] and notes == "Not specified"
+        options = {name: item[name] for name in ("vibe_keywords", "target_audience", "tone", "use_case") if item.get(name)}
+        completion = story_completion(item["product_name"], notes, item["output_length"], model_tier=model_tier, **options)
+        story = complete_text(priority=PRIORITY_BATCH, timeout=SCHEDULER_DEADLINES[PRIORITY_BATCH], **completion)
+        if not story:
+            raise ValueError("empty completion")
+        record.update(status="succeeded", story=story, word_count=len(_tokenize(story)))
+    except Exception as e:
+        print(f"Batch row {item['row']} failed: {e}")
+        record.update(status="failed", error=str(e) or type(e).__name__)
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+    return record
+
+
+def run_story_batch(items, output_path, concurrency=BATCH_CONCURRENCY, model_tier=None, progress=None):
+    """
+    Generates stories for batch items concurrently and appends one JSON line
+    per finished row to `output_path`, flushed and fsynced as it completes.
+    Rows already recorded as succeeded are skipped, so re-running after a
+    crash resumes where it stopped and retries failed rows. Upstream rate
+    limits are enforced by the LLM scheduler, where batch calls queue behind
+    interactive ones. `progress(event, payload)` hears about every finished
+    row. Returns a summary dict.
+    """
+    with active_batches_lock:
+        if output_path in active_batches:
+            raise BatchInProgress(f"{output_path} is already being generated")
+        active_batches.add(output_path)
+    try:
+        completed = batch_checkpoint(output_path)
+        todo = [item for item in items if item["row"] not in completed]
+        counts = {"total": len(items), "skipped": len(items) - len(todo), "succeeded": 0, "failed": 0, "notes_fallback": 0}
+        started = time.perf_counter()
+        print(f"Batch {output_path}: {len(todo)} rows to generate, {counts['skipped']} already done")
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, 'a+', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='aura-batch') as pool:
+            # Terminate a line torn by a crash so the next record starts cleanly
+            if out.tell():
+                out.seek(out.tell() - 1)
+                if out.read(1) != "\n":
+                    out.write("\n")
+
+            def write(record):
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                counts[record["status"]] += 1
+                counts["notes_fallback"] += bool(record.get("notes_fallback"))
+                finished = counts["succeeded"] + counts["failed"]
+                elapsed = time.perf_counter() - started
+                rate = finished / elapsed if elapsed else 0.0
+                if progress:
+                    progress("row", {
+                        "row": record["row"],
+                        "status": record["status"],
+                        "error": record.get("error"),
+                        "done": counts["skipped"] + finished,
+                        **counts,
+                        "rows_per_sec": round(rate, 2),
+                        "eta_s": round((len(todo) - finished) / rate) if rate else None,
+                    })
+
+            # Keep only a couple of rows per worker queued so progress and memory stay bounded
+            pending = set()
+            for item in todo:
+                if len(pending) >= concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+                pending.add(submit_in_context(pool, generate_batch_row, item, model_tier))
+            for future in as_completed(pending):
+                write(future.result())
+
+        elapsed = time.perf_counter() - started
+        generated = counts["succeeded"] + counts["failed"]
+        summary = {
+            "output": output_path,
+            **counts,
+            "elapsed_s": round(elapsed, 1),
+            "rows_per_sec": round(generated / elapsed, 2) if elapsed else None,
+        }
+        print(f"Batch {output_path} complete: {summary}")
+        return summary
+    finally:
+        with active_batches_lock:
+            active_batches.discard(output_path)
+
+
+def batch_output_path(batch_id):
+    return os.path.join(BATCH_OUTPUT_DIR, f"{batch_id}.jsonl")
+
+
+def batch_concurrency(value):
+    """
+    Parses a requested batch concurrency, defaulting to BATCH_CONCURRENCY and
+    capped at four times it. Raises ValueError for anything but a positive integer.
+    """
+    if value in (None, ''):
+        return BATCH_CONCURRENCY
+    concurrency = int(value)
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    return min(concurrency, BATCH_CONCURRENCY * 4)
+
+
+def story_batch_job(params, progress=None):
+    """
+    Background-job entry point for POST /generate/batch: {batch_id, items
+    (raw catalog rows), concurrency?, model_tier?}. Returns (response, status).
+    """
+    batch_id = str(params.get("batch_id") or "")
+    if not BATCH_ID_RE.match(batch_id):
+        return {"error": "batch_id may only contain letters, digits, '-' and '_'"}, 400
+    try:
+        concurrency = batch_concurrency(params.get("concurrency"))
+    except (TypeError, ValueError):
+        return {"error": "concurrency must be a positive integer"}, 400
+    try:
+        summary = run_story_batch(
+            story_batch_items(params.get("items") or []),
+            batch_output_path(batch_id),
+            concurrency=concurrency,
+            model_tier=params.get("model_tier"),
+            progress=progress,
+        )
+    except BatchInProgress as e:
+        return {"error": str(e), "batch_id": batch_id}, 409
+    return {"batch_id": batch_id, **summary}, 200
+
+
+@app.cli.command('generate-batch')
+@click.argument('catalog', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--concurrency', default=BATCH_CONCURRENCY, show_default=True, help='Rows generated at once.')
+@click.option('--model-tier', default=None, help='Tier or model override for every story.')
+def generate_batch(catalog, output, concurrency, model_tier):
+    """
+    Generate stories for a CSV/JSONL catalog into a JSONL file.
+    Re-running with the same OUTPUT resumes after the last completed row.
+    """
+    if not client:
+        raise click.ClickException("Groq client not initialized. Please check your API key.")
+    with open(catalog, newline='', encoding='utf-8') as f:
+        items = story_batch_items(read_catalog_rows(f, jsonl=catalog.endswith('.jsonl')))
+
+    def report(event, payload):
+        eta = f", ETA {payload['eta_s']}s" if payload['eta_s'] is not None else ""
+        error = f": {payload['error']}" if payload['error'] else ""
+        click.echo(f"[{payload['done']}/{payload['total']}] {payload['row']} {payload['status']}{error} "
+                   f"({payload['rows_per_sec']} rows/s{eta})")
+
+    summary = run_story_batch(items, output, concurrency=max(1, concurrency), model_tier=model_tier, progress=report)
+    click.echo(
+        f"Generated {summary['succeeded']} stories ({summary['failed']} failed, {summary['skipped']} already done, "
+        f"{summary['notes_fallback']} without notes) in {summary['elapsed_s']}s into {output}"
+    )
+
+
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch_route():
+    """
+    Queue a catalog for bulk story generation as a background job.
+    Accepts a `catalog` file upload (CSV or .jsonl), a raw CSV / NDJSON body,
+    or JSON {"items": [...]}. Submitting again with the same `batch_id`
+    resumes that batch, skipping rows already generated. Progress comes
+    through the job API; results are appended to the batch output as rows finish.
+    """
+    if not client:
+        return jsonify({"error": "Groq client not initialized"}), 500
+
+    options = request.get_json(silent=True) if request.is_json else {**request.args, **request.form}
+    options = options or {}
+    upload = request.files.get('catalog')
+    try:
+        if upload:
+            text = upload.read().decode('utf-8-sig')
+            rows = read_catalog_rows(StringIO(text), jsonl=(upload.filename or '').endswith('.jsonl'))
+        elif request.is_json:
+            rows = options.get('items') or []
+        else:
+            text = request.get_data(as_text=True)
+            rows = read_catalog_rows(StringIO(text), jsonl='ndjson' in request.mimetype or 'jsonl' in request.mimetype)
+    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+        return jsonify({"error": f"Could not parse catalog: {e}"}), 400
+
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return jsonify({"error": "items must be a list of objects"}), 400
+    if not rows:
+        return jsonify({"error": "Catalog has no rows"}), 400
+    if len(rows) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} rows per batch"}), 413
+    idempotency_key = request.headers.get('Idempotency-Key')
+    # A retried submission without a batch_id must map to the same batch, so derive it from the key
+    default_id = hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()[:12] if idempotency_key else uuid.uuid4().hex[:12]
+    batch_id = str(options.get('batch_id') or default_id)
+    if not BATCH_ID_RE.match(batch_id):
+        return jsonify({"error": "batch_id may only contain letters, digits, '-' and '_'"}), 400
+    try:
+        batch_concurrency(options.get('concurrency'))
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be a positive integer"}), 400
+
+    params = {"batch_id": batch_id, "items": rows, "concurrency": options.get('concurrency'), "model_tier": options.get('model_tier')}
+    job = jobs.find('generate-batch', idempotency_key) if idempotency_key else None
+    if job and job.fingerprint != jobs.fingerprint(params):
+        return jsonify({"error": "Idempotency-Key was already used with a different request", "job_id": job.id}), 409
+    created = False
+    if not job:
+        with active_batches_lock:
+            running = batch_output_path(batch_id) in active_batches
+        if running:
+            return jsonify({"error": f"Batch {batch_id} is already running", "batch_id": batch_id}), 409
+        try:
+            job, created = jobs.submit('generate-batch', params, idempotency_key)
+        except JobQueueFull as e:
+            response = jsonify({"error": "Too many background jobs queued; try again shortly", "detail": str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        if not created and job.fingerprint != jobs.fingerprint(params):
+            return jsonify({"error": "Idempotency-Key was already used with a different request", "job_id": job.id}), 409
+
+    response = jsonify({
+        "job_id": job.id,
+        "batch_id": batch_id,
+        "rows": len(rows),
+        "status": job.status,
+        "deduplicated": not created,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+        "output_url": f"/generate/batch/{batch_id}/output",
+    })
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response, 202 if created else 200
+
+
+@app.route('/generate/batch/<batch_id>/output')
+def batch_output(batch_id):
+    """
+    Download a batch's JSONL output, complete or in progress.
+    """
+    path = batch_output_path(batch_id)
+    if not BATCH_ID_RE.match(batch_id) or not os.path.exists(path):
+        return jsonify({"error": "Unknown batch"}), 404
+    return send_file(path, mimetype='application/x-ndjson', download_name=f"{batch_id}.jsonl")
 
 
 @app.route('/analyze-customer', methods=['POST'])
 def analyze_customer():
     """
     Multi-Agent Customer Analysis
-    Uses 5 specialized AI agents to analyze the customer/fragrance from different angles
+    Uses 5 specialized AI agents to analyze the customer/fragrance from different angles.
+    The four independent agents run concurrently; only the synthesis agent waits on them.
     """
     if not client:
         return jsonify({"error": "Groq client not initialized"}), 500
     
     try:
-        data = request.get_json()
-        fragrance_name = data.get('fragrance_name', 'Unnamed Fragrance')
-        key_notes = data.get('key_notes', '')
-        target_audience = data.get('target_audience', '')
-        vibe_keywords = data.get('vibe_keywords', '')
+        response, status = customer_analysis(request.get_json())
+        return jsonify(response), status
         
-        print(f"=== Multi-Agent Analysis Started for: {fragrance_name} ===")
-        
-        # Agent 1: Customer Profile Agent
-        profile_prompt = f"""As a Customer Profile Agent, analyze the target audience for this fragrance:
+    except Exception as e:
+        print(f"Error in multi-agent analysis: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Failed to complete multi-agent analysis"}), 500
+
+
+def customer_analysis(data, progress=None):
+    """
+    Runs the five-agent analysis for one /analyze-customer body.
+    Returns (response, status). `progress(event, payload)` hears about each
+    agent as it finishes, for background jobs.
+    """
+    fragrance_name = data.get('fragrance_name', 'Unnamed Fragrance')
+    key_notes = data.get('key_notes', '')
+    target_audience = data.get('target_audience', '')
+    vibe_keywords = data.get('vibe_keywords', '')
+    
+    print(f"=== Multi-Agent Analysis Started for: {fragrance_name} ===")
+    started = time.perf_counter()
+    
+    def on_result(name, error, elapsed_ms):
+        if progress:
+            progress("agent", {"name": name, "error": error, "elapsed_ms": elapsed_ms})
+    
+    # Agents 1-4 are independent: fan out, then fan in for the synthesis
+    results, errors, timings = run_agents_concurrently(
+        _customer_analysis_agents(fragrance_name, key_notes, target_audience, vibe_keywords, data.get('model_tier')),
+        on_result=on_result,
+    )
+    
+    if not results:
+        print(f"All analysis agents failed: {errors}")
+        return {"error": "Failed to complete multi-agent analysis", "errors": errors}, 500
+    
+    # Agent 5: Understanding Agent (Synthesizes all insights)
+    synthesis_agent = _synthesis_agent(results, data.get('model_tier'))
+    t0 = time.perf_counter()
+    try:
+        with span("agent.synthesis"):
+            understanding_analysis = run_agent(**synthesis_agent)
+    except Exception as e:
+        print(f"Synthesis agent failed: {e}")
+        understanding_analysis = None
+        errors["synthesis"] = str(e) or type(e).__name__
+    timings["synthesis"] = round((time.perf_counter() - t0) * 1000)
+    timings["total"] = round((time.perf_counter() - started) * 1000)
+    on_result("synthesis", errors.get("synthesis"), timings["synthesis"])
+    
+    print(f"=== Multi-Agent Analysis Complete in {timings['total']}ms ===")
+    
+    response = {
+        "success": True,
+        "analysis": {
+            "customer_profile": results.get("customer_profile"),
+            "preferences": results.get("preferences"),
+            "psychology": results.get("psychology"),
+            "market_trends": results.get("market_trends"),
+            "synthesis": understanding_analysis
+        },
+        "timings": timings
+    }
+    if errors:
+        response["partial"] = True
+        response["errors"] = errors
+    return response, 200
+
+
+@app.route('/analyze-customer/stream', methods=['POST'])
+def analyze_customer_stream():
+    """
+    Streaming Multi-Agent Customer Analysis
+    Emits one server-sent event per agent as soon as it finishes
+    (customer_profile, preferences, psychology, market_trends), then streams the
+    synthesis tokens live and closes with a `done` event carrying all timings.
+    """
+    if not client:
+        return jsonify({"error": "Groq client not initialized"}), 500
+
+    data = request.get_json()
+    fragrance_name = data.get('fragrance_name', 'Unnamed Fragrance')
+    agents = _customer_analysis_agents(
+        fragrance_name,
+        data.get('key_notes', ''),
+        data.get('target_audience', ''),
+        data.get('vibe_keywords', ''),
+        data.get('model_tier'),
+    )
+
+    def stream():
+        print(f"=== Streaming Multi-Agent Analysis Started for: {fragrance_name} ===")
+        started = time.perf_counter()
+        results, errors, timings = {}, {}, {}
+        try:
+            for name, result, error, elapsed_ms in iter_agents_concurrently(agents):
+                timings[name] = elapsed_ms
+                if error:
+                    errors[name] = error
+                else:
+                    results[name] = result
+                yield sse_event(name, {"content": result, "error": error, "elapsed_ms": elapsed_ms})
+
+            if not results:
+                yield sse_event("error", {"error": "Failed to complete multi-agent analysis", "errors": errors})
+                return
+
+            t0 = time.perf_counter()
+            first_token_ms = None
+            synthesis = []
+            try:
+                upstream = UpstreamCancel()
+                for part in coalesce_tokens('analyze-customer/stream', stream_agent(cancel=upstream, **_synthesis_agent(results, data.get('model_tier'))), upstream):
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - t0) * 1000)
+                    synthesis.append(part)
+                    yield sse_event("synthesis_token", {"token": part})
+            except Exception as e:
+                print(f"Synthesis agent failed: {e}")
+                errors["synthesis"] = str(e) or type(e).__name__
+            timings["synthesis"] = round((time.perf_counter() - t0) * 1000)
+            yield sse_event("synthesis", {
+                "content": "".join(synthesis).strip() or None,
+                "error": errors.get("synthesis"),
+                "elapsed_ms": timings["synthesis"],
+                "first_token_ms": first_token_ms,
+            })
+
+            timings["total"] = round((time.perf_counter() - started) * 1000)
+            print(f"=== Streaming Multi-Agent Analysis Complete in {timings['total']}ms ===")
+            yield sse_event("done", {"success": True, "partial": bool(errors), "errors": errors, "timings": timings})
+        except Exception as e:
+            print(f"Error in streaming multi-agent analysis: {e}")
+            print(traceback.format_exc())
+            yield sse_event("error", {"error": "Failed to complete multi-agent analysis"})
+
+    return streaming_response('analyze-customer/stream', stream())
+
+
+def _customer_analysis_agents(fragrance_name, key_notes, target_audience, vibe_keywords, model_tier=None):
+    """
+    Builds the four independent /analyze-customer agents, keyed by result name.
+    `model_tier` overrides the routed model for every agent except the web-search one.
+    """
+    model = model_router.model("analysis", model_tier)
+    # Agent 1: Customer Profile Agent
+    profile_prompt = f"""As a Customer Profile Agent, analyze the target audience for this fragrance:
 
 Fragrance: {fragrance_name}
 Target Audience: {target_audience or 'General luxury fragrance buyer'}
@@ -283,19 +3164,8 @@ Provide a detailed customer profile including:
 
 Keep it concise (150 words max)."""
 
-        profile_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a Customer Profile Analyst specializing in luxury fragrance markets."},
-                {"role": "user", "content": profile_prompt}
-            ],
-            temperature=0.6,
-            max_tokens=300,
-        )
-        profile_analysis = profile_response.choices[0].message.content.strip()
-        
-        # Agent 2: Preference Agent
-        preference_prompt = f"""As a Preference Agent, analyze the scent preferences for this fragrance:
+    # Agent 2: Preference Agent
+    preference_prompt = f"""As a Preference Agent, analyze the scent preferences for this fragrance:
 
 Fragrance: {fragrance_name}
 Notes: {key_notes}
@@ -309,19 +3179,8 @@ Analyze:
 
 Keep it concise (150 words max)."""
 
-        preference_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a Fragrance Preference Analyst with deep knowledge of olfactory families and consumer taste patterns."},
-                {"role": "user", "content": preference_prompt}
-            ],
-            temperature=0.6,
-            max_tokens=300,
-        )
-        preference_analysis = preference_response.choices[0].message.content.strip()
-        
-        # Agent 3: Psychology Agent
-        psychology_prompt = f"""As a Psychology Agent, analyze the emotional triggers and motivations for this fragrance:
+    # Agent 3: Psychology Agent
+    psychology_prompt = f"""As a Psychology Agent, analyze the emotional triggers and motivations for this fragrance:
 
 Fragrance: {fragrance_name}
 Notes: {key_notes}
@@ -336,19 +3195,8 @@ Analyze:
 
 Keep it concise (150 words max)."""
 
-        psychology_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a Consumer Psychology Specialist focusing on fragrance purchasing behavior and emotional connections."},
-                {"role": "user", "content": psychology_prompt}
-            ],
-            temperature=0.6,
-            max_tokens=300,
-        )
-        psychology_analysis = psychology_response.choices[0].message.content.strip()
-        
-        # Agent 4: Public Data Agent (using web-search model)
-        public_data_prompt = f"""As a Market Trends Agent, analyze current market trends for this type of fragrance:
+    # Agent 4: Public Data Agent (using web-search model)
+    public_data_prompt = f"""As a Market Trends Agent, analyze current market trends for this type of fragrance:
 
 Fragrance: {fragrance_name}
 Notes: {key_notes}
@@ -362,31 +3210,68 @@ Research and provide:
 
 Keep it concise (150 words max)."""
 
-        public_data_response = client.chat.completions.create(
-            model="groq/compound",  # Web-search enabled
-            messages=[
+    return {
+        "customer_profile": {
+            "model": model,
+            "task": "analysis",
+            "messages": [
+                {"role": "system", "content": "You are a Customer Profile Analyst specializing in luxury fragrance markets."},
+                {"role": "user", "content": profile_prompt}
+            ],
+            "temperature": 0.6,
+            "max_tokens": 300,
+        },
+        "preferences": {
+            "model": model,
+            "task": "analysis",
+            "messages": [
+                {"role": "system", "content": "You are a Fragrance Preference Analyst with deep knowledge of olfactory families and consumer taste patterns."},
+                {"role": "user", "content": preference_prompt}
+            ],
+            "temperature": 0.6,
+            "max_tokens": 300,
+        },
+        "psychology": {
+            "model": model,
+            "task": "analysis",
+            "messages": [
+                {"role": "system", "content": "You are a Consumer Psychology Specialist focusing on fragrance purchasing behavior and emotional connections."},
+                {"role": "user", "content": psychology_prompt}
+            ],
+            "temperature": 0.6,
+            "max_tokens": 300,
+        },
+        "market_trends": {
+            "model": model_router.model("market_trends"),  # Web-search enabled
+            "task": "market_trends",
+            "messages": [
                 {"role": "system", "content": "You are a Market Research Analyst specializing in fragrance industry trends and consumer data."},
                 {"role": "user", "content": public_data_prompt}
             ],
-            temperature=0.5,
-            max_tokens=300,
-        )
-        public_data_analysis = public_data_response.choices[0].message.content.strip()
-        
-        # Agent 5: Understanding Agent (Synthesizes all insights)
-        understanding_prompt = f"""As the Understanding Agent, synthesize these multi-agent analyses into actionable insights:
+            "temperature": 0.5,
+            "max_tokens": 300,
+        },
+    }
+
+
+def _synthesis_agent(results, model_tier=None):
+    """
+    Builds the Understanding Agent from whichever analyses completed.
+    """
+    unavailable = "Not available (agent did not respond)"
+    understanding_prompt = f"""As the Understanding Agent, synthesize these multi-agent analyses into actionable insights:
 
 CUSTOMER PROFILE:
-{profile_analysis}
+{results.get("customer_profile", unavailable)}
 
 PREFERENCE ANALYSIS:
-{preference_analysis}
+{results.get("preferences", unavailable)}
 
 PSYCHOLOGY INSIGHTS:
-{psychology_analysis}
+{results.get("psychology", unavailable)}
 
 MARKET TRENDS:
-{public_data_analysis}
+{results.get("market_trends", unavailable)}
 
 Provide a synthesis that includes:
 - Key insights summary (what stands out across all analyses)
@@ -396,85 +3281,133 @@ Provide a synthesis that includes:
 
 Keep it concise but comprehensive (200 words max)."""
 
-        understanding_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a Strategic Synthesis Agent that combines multiple data points into actionable business insights."},
-                {"role": "user", "content": understanding_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=400,
-        )
-        understanding_analysis = understanding_response.choices[0].message.content.strip()
-        
-        print("=== Multi-Agent Analysis Complete ===")
-        
-        return jsonify({
-            "success": True,
-            "analysis": {
-                "customer_profile": profile_analysis,
-                "preferences": preference_analysis,
-                "psychology": psychology_analysis,
-                "market_trends": public_data_analysis,
-                "synthesis": understanding_analysis
-            }
-        })
-        
-    except Exception as e:
-        print(f"Error in multi-agent analysis: {e}")
-        print(traceback.format_exc())
-        return jsonify({"error": "Failed to complete multi-agent analysis"}), 500
+    return {
+        "model": model_router.model("synthesis", model_tier),
+        "task": "synthesis",
+        "messages": [
+            {"role": "system", "content": "You are a Strategic Synthesis Agent that combines multiple data points into actionable business insights."},
+            {"role": "user", "content": understanding_prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 400,
+    }
 
 
 @app.route('/generate-variants', methods=['POST'])
 def generate_variants():
     """
     Generate multiple story variants for A/B testing
-    Each variant uses insights from different agents
+    Each variant uses insights from different agents.
+    Variants are generated concurrently; pass "stream": true to receive all
+    variants' tokens multiplexed over one SSE connection, tagged by variant id.
     """
     if not client:
         return jsonify({"error": "Groq client not initialized"}), 500
     
     try:
         data = request.get_json()
-        fragrance_name = data.get('fragrance_name', 'Unnamed Fragrance')
-        key_notes = data.get('key_notes', '')
-        agent_insights = data.get('agent_insights', {})
-        num_variants = data.get('num_variants', 2)  # Default: 2 variants for A/B testing
+        if data.get('stream'):
+            variants, agents = _variant_request(data)
+            return streaming_response('generate-variants', _stream_variants(variants, agents))
         
-        print(f"=== Generating {num_variants} story variants for: {fragrance_name} ===")
+        response, status = story_variants(data)
+        return jsonify(response), status
         
-        variants = []
-        
-        # Variant approaches based on different agent insights
-        approaches = [
-            {
-                "name": "Psychology-Driven",
-                "focus": "psychology",
-                "instruction": f"Focus on emotional triggers and psychological benefits. Use insights: {agent_insights.get('psychology', '')}"
-            },
-            {
-                "name": "Profile-Optimized",
-                "focus": "customer_profile",
-                "instruction": f"Tailor to the specific customer profile and lifestyle. Use insights: {agent_insights.get('customer_profile', '')}"
-            },
-            {
-                "name": "Trend-Aligned",
-                "focus": "market_trends",
-                "instruction": f"Align with current market trends and competitive positioning. Use insights: {agent_insights.get('market_trends', '')}"
-            },
-            {
-                "name": "Preference-Based",
-                "focus": "preferences",
-                "instruction": f"Appeal to scent preferences and olfactory family lovers. Use insights: {agent_insights.get('preferences', '')}"
-            }
-        ]
+    except Exception as e:
+        print(f"Error generating variants: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Failed to generate story variants"}), 500
+
+
+def _variant_request(data):
+    """
+    Parses a /generate-variants body into (variant descriptors, agents by variant id).
+    """
+    fragrance_name = data.get('fragrance_name', 'Unnamed Fragrance')
+    num_variants = data.get('num_variants', 2)  # Default: 2 variants for A/B testing
+    num_variants = max(1, min(int(num_variants), MAX_VARIANTS))
+    
+    print(f"=== Generating {num_variants} story variants for: {fragrance_name} ===")
+    
+    variants = _variant_specs(
+        fragrance_name, data.get('key_notes', ''), data.get('agent_insights') or {}, num_variants, data.get('model_tier')
+    )
+    agents = {variant["id"]: variant.pop("agent") for variant in variants}
+    return variants, agents
+
+
+def story_variants(data, progress=None):
+    """
+    Generates the variants for one /generate-variants body concurrently.
+    Returns (response, status). `progress(event, payload)` hears about each
+    variant as it finishes, for background jobs.
+    """
+    variants, agents = _variant_request(data)
+    
+    def on_result(variant_id, error, elapsed_ms):
+        if progress:
+            progress("variant", {"id": variant_id, "error": error, "elapsed_ms": elapsed_ms})
+    
+    results, errors, timings = run_agents_concurrently(agents, on_result=on_result)
+    if not results:
+        print(f"All variants failed: {errors}")
+        return {"error": "Failed to generate story variants"}, 500
+    
+    completed = []
+    for variant in variants:
+        if variant["id"] in results:
+            variant["content"] = results[variant["id"]]
+            variant["elapsed_ms"] = timings[variant["id"]]
+            completed.append(variant)
+    
+    print(f"=== Generated {len(completed)} variants successfully ===")
+    
+    response = {
+        "success": True,
+        "variants": completed
+    }
+    if errors:
+        response["partial"] = True
+        response["errors"] = errors
+    return response, 200
+
+
+def _variant_specs(fragrance_name, key_notes, agent_insights, num_variants, model_tier=None):
+    """
+    Builds num_variants variant descriptors, each carrying its agent spec under "agent".
+    Approaches are cycled when more variants are requested than there are approaches.
+    """
+    # Variant approaches based on different agent insights
+    approaches = [
+        {
+            "name": "Psychology-Driven",
+            "focus": "psychology",
+            "instruction": f"Focus on emotional triggers and psychological benefits. Use insights: {agent_insights.get('psychology', '')}"
+        },
+        {
+            "name": "Profile-Optimized",
+            "focus": "customer_profile",
+            "instruction": f"Tailor to the specific customer profile and lifestyle. Use insights: {agent_insights.get('customer_profile', '')}"
+        },
+        {
+            "name": "Trend-Aligned",
+            "focus": "market_trends",
+            "instruction": f"Align with current market trends and competitive positioning. Use insights: {agent_insights.get('market_trends', '')}"
+        },
+        {
+            "name": "Preference-Based",
+            "focus": "preferences",
+            "instruction": f"Appeal to scent preferences and olfactory family lovers. Use insights: {agent_insights.get('preferences', '')}"
+        }
+    ]
+    
+    variants = []
+    for i in range(num_variants):
+        approach = approaches[i % len(approaches)]
+        take = i // len(approaches) + 1
+        name = approach['name'] if take == 1 else f"{approach['name']} #{take}"
         
-        # Generate the requested number of variants
-        for i in range(min(num_variants, len(approaches))):
-            approach = approaches[i]
-            
-            variant_prompt = f"""Create a luxury fragrance product description (300-400 words) for:
+        variant_prompt = f"""Create a luxury fragrance product description (300-400 words) for:
 
 **Fragrance:** {fragrance_name}
 **Notes:** {key_notes}
@@ -489,64 +3422,365 @@ Use Markdown formatting with ### headings:
 
 Make it sophisticated, sensory, and conversion-focused."""
 
-            variant_response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
+        variants.append({
+            "id": i + 1,
+            "name": name,
+            "focus_agent": approach['focus'],
+            "agent": {
+                "model": model_router.model("variant", model_tier),
+                "task": "variant",
+                "messages": [
                     {"role": "system", "content": "You are an elite fragrance copywriter creating targeted product descriptions based on customer insights."},
                     {"role": "user", "content": variant_prompt}
                 ],
-                temperature=0.75,
-                max_tokens=800,
-            )
-            
-            variants.append({
-                "id": i + 1,
-                "name": approach['name'],
-                "focus_agent": approach['focus'],
-                "content": variant_response.choices[0].message.content.strip()
-            })
-        
-        print(f"=== Generated {len(variants)} variants successfully ===")
-        
-        return jsonify({
-            "success": True,
-            "variants": variants
+                "temperature": 0.75,
+                "max_tokens": 800,
+            }
         })
-        
+    return variants
+
+
+def _stream_variants(variants, agents):
+    """
+    Multiplexes every variant's token stream into one SSE stream tagged by variant id.
+    """
+    started = time.perf_counter()
+    contents = {variant["id"]: [] for variant in variants}
+    errors, timings = {}, {}
+    try:
+        for variant in variants:
+            yield sse_event("variant_start", variant)
+        for variant_id, part, error in iter_multiplexed_streams(agents, endpoint='generate-variants'):
+            if part is not None:
+                contents[variant_id].append(part)
+                yield sse_event("variant_token", {"id": variant_id, "token": part})
+                continue
+            timings[variant_id] = round((time.perf_counter() - started) * 1000)
+            if error:
+                errors[variant_id] = error
+            yield sse_event("variant_done", {
+                "id": variant_id,
+                "content": "".join(contents[variant_id]).strip() or None,
+                "error": error,
+                "elapsed_ms": timings[variant_id],
+            })
+        timings["total"] = round((time.perf_counter() - started) * 1000)
+        print(f"=== Streamed {len(variants) - len(errors)} variants in {timings['total']}ms ===")
+        yield sse_event("done", {"success": len(errors) < len(variants), "partial": bool(errors), "errors": errors, "timings": timings})
     except Exception as e:
-        print(f"Error generating variants: {e}")
+        print(f"Error streaming variants: {e}")
         print(traceback.format_exc())
-        return jsonify({"error": "Failed to generate story variants"}), 500
+        yield sse_event("error", {"error": "Failed to generate story variants"})
 
 
-@app.route('/chat', methods=['POST'])
-def chat():
+class JobQueueFull(RuntimeError):
     """
-    Curator mode: conversational fragrance recommendations
-    Supports both standard and deep analysis modes
+    Raised when a job is submitted while the background queue is at capacity.
+    """
+
+
+class Job:
     """
+    One background job: its status, a bounded log of progress events for
+    pollers and SSE subscribers, and the result or error once finished.
+    The terminal `done` / `error` event is the last entry in the log.
+    """
+
+    def __init__(self, job_id, kind, max_events, idempotency_key=None, fingerprint=None):
+        self.id = job_id
+        self.kind = kind
+        self.idempotency_key = idempotency_key
+        self.fingerprint = fingerprint
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.updated = time.monotonic()
+        self.events = deque(maxlen=max_events)
+        self.next_seq = 0
+        self.cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def _append(self, event, data):
+        self.events.append((self.next_seq, event, data))
+        self.next_seq += 1
+        self.updated = time.monotonic()
+        self.cond.notify_all()
+
+    def start(self):
+        with self.cond:
+            self.status = "running"
+            self.started_at = time.time()
+            self._append("status", {"status": "running"})
+
+    def progress(self, event, data):
+        with self.cond:
+            self._append(event, data)
+
+    def finish(self, result=None, error=None):
+        with self.cond:
+            self.status = "failed" if error is not None else "succeeded"
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self._append("error" if error is not None else "done", error if error is not None else result)
+
+    def follow(self, after_seq, idle_timeout):
+        """
+        Yields (seq, event, data) after `after_seq` until the terminal event.
+        Events already evicted from the log are skipped.
+        """
+        while True:
+            with self.cond:
+                pending = [item for item in self.events if item[0] > after_seq]
+                if not pending:
+                    if self.done:
+                        return
+                    self.cond.wait(idle_timeout)
+                    continue
+            for item in pending:
+                yield item
+                after_seq = item[0]
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "progress": [{"event": event, **data} for _, event, data in self.events if event not in ("done", "error")],
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobStore:
+    """
+    Runs long multi-agent requests on a bounded worker pool, detached from
+    the HTTP request. At most `max_queued` jobs wait for a worker; beyond
+    that submissions are refused. Finished jobs are kept for `ttl` seconds
+    and at most `max_jobs` are retained (oldest finished evicted first).
+    An idempotency key maps a repeated submission to the original job while
+    that job is retained. Kinds listed in `dedicated_workers` run on their own
+    pool of that size, so hours-long work cannot starve the shared pool.
+    """
+
+    def __init__(self, kinds, workers, max_queued, max_jobs, max_events, ttl, dedicated_workers=None):
+        self.kinds = kinds
+        self.workers = workers
+        self.dedicated_workers = dedicated_workers or {}
+        self.max_queued = max_queued
+        self.max_jobs = max_jobs
+        self.max_events = max_events
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._idempotency = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='aura-job')
+        self._dedicated = {
+            kind: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f'aura-job-{kind}')
+            for kind, count in self.dedicated_workers.items()
+        }
+        self.stats = {"submitted": 0, "deduplicated": 0, "rejected": 0, "succeeded": 0, "failed": 0, "evicted": 0}
+
+    @staticmethod
+    def fingerprint(params):
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def submit(self, kind, params, idempotency_key=None):
+        """
+        Queues a job; returns (job, created). With a known idempotency key
+        the existing job is returned with created=False; callers compare its
+        fingerprint to detect a key reused for a different request.
+        """
+        fingerprint = self.fingerprint(params)
+        with self._lock:
+            self._purge()
+            if idempotency_key:
+                existing = self._jobs.get(self._idempotency.get((kind, idempotency_key)))
+                if existing:
+                    if existing.fingerprint == fingerprint:
+                        self.stats["deduplicated"] += 1
+                    return existing, False
+            if sum(1 for job in self._jobs.values() if job.status == "queued") >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise JobQueueFull(f"{self.max_queued} jobs are already waiting")
+            job = Job(uuid.uuid4().hex[:16], kind, self.max_events, idempotency_key, fingerprint)
+            self._jobs[job.id] = job
+            if idempotency_key:
+                self._idempotency[(kind, idempotency_key)] = job.id
+            self.stats["submitted"] += 1
+        # Jobs outlive their request, so they do not join its trace
+        self._dedicated.get(kind, self._executor).submit(self._run, job, params)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def find(self, kind, idempotency_key):
+        """
+        The retained job submitted with this idempotency key, if any.
+        """
+        with self._lock:
+            self._purge()
+            return self._jobs.get(self._idempotency.get((kind, idempotency_key)))
+
+    def _run(self, job, params):
+        job.start()
+        try:
+            response, status = self.kinds[job.kind](params, job.progress)
+            if status >= 400:
+                job.finish(error=response)
+            else:
+                job.finish(result=response)
+        except Exception as e:
+            print(f"Error in {job.kind} job {job.id}: {e}")
+            print(traceback.format_exc())
+            job.finish(error={"error": f"{job.kind} job failed"})
+        with self._lock:
+            self.stats[job.status] += 1
+
+    def _purge(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.done and now - job.updated > self.ttl:
+                self._evict(job_id)
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        while len(self._jobs) > self.max_jobs and finished:
+            self._evict(finished.pop(0))
+            self.stats["evicted"] += 1
+
+    def _evict(self, job_id):
+        job = self._jobs.pop(job_id)
+        if job.idempotency_key and self._idempotency.get((job.kind, job.idempotency_key)) == job_id:
+            del self._idempotency[(job.kind, job.idempotency_key)]
+
+    def snapshot(self):
+        with self._lock:
+            self._purge()
+            statuses = defaultdict(int)
+            for job in self._jobs.values():
+                statuses[job.status] += 1
+            return {
+                "jobs": len(self._jobs),
+                "by_status": dict(statuses),
+                "workers": self.workers,
+                "dedicated_workers": self.dedicated_workers,
+                "max_queued": self.max_queued,
+                "max_jobs": self.max_jobs,
+                "ttl_seconds": self.ttl,
+                **self.stats,
+            }
+
+
+jobs = JobStore(
+    kinds={'analyze-customer': customer_analysis, 'generate-variants': story_variants, 'generate-batch': story_batch_job},
+    workers=int(os.getenv('AURA_JOB_WORKERS', '4')),
+    max_queued=int(os.getenv('AURA_JOB_MAX_QUEUED', '100')),
+    max_jobs=int(os.getenv('AURA_JOB_MAX_JOBS', '500')),
+    max_events=int(os.getenv('AURA_JOB_MAX_EVENTS', '200')),
+    ttl=float(os.getenv('AURA_JOB_TTL', '3600')),
+    # Catalog batches can run for hours; keep them off the Lab jobs' workers
+    dedicated_workers={'generate-batch': int(os.getenv('AURA_BATCH_WORKERS', '1'))},
+)
+
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    """
+    Queues an /analyze-customer or /generate-variants request as a background
+    job and returns its id immediately (202). The body is the same as the
+    synchronous route's. Catalog batches run on the same job store but are
+    only submitted through /generate/batch, which validates and caps them.
+    An `Idempotency-Key` header makes retries and double-clicks return the
+    original job (200) instead of starting another.
+    """
+    if kind == 'generate-batch':
+        return jsonify({"error": "Submit catalog batches through POST /generate/batch"}), 404
+    if kind not in jobs.kinds:
+        return jsonify({"error": f"Unknown job type '{kind}'", "types": sorted(set(jobs.kinds) - {'generate-batch'})}), 404
     if not client:
-        return jsonify({"error": "Groq client not initialized. Please check your API key."}), 500
+        return jsonify({"error": "Groq client not initialized"}), 500
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    idempotency_key = request.headers.get('Idempotency-Key') or data.pop('idempotency_key', None)
+    try:
+        job, created = jobs.submit(kind, data, idempotency_key)
+    except JobQueueFull as e:
+        response = jsonify({"error": "Too many background jobs queued; try again shortly", "detail": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    if not created and job.fingerprint != jobs.fingerprint(data):
+        return jsonify({"error": "Idempotency-Key was already used with a different request", "job_id": job.id}), 409
+
+    response = jsonify({
+        "job_id": job.id,
+        "kind": kind,
+        "status": job.status,
+        "deduplicated": not created,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    })
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response, 202 if created else 200
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Polls a background job: status, progress so far and, once finished, the
+    same result (or error) body the synchronous route would have returned.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job.snapshot())
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-sent events for a background job: a `job` event with the current
+    status, then each progress event (`agent` / `variant`) and a final `done`
+    (result) or `error` event. Events carry `id:` sequence numbers, so a
+    reconnect with Last-Event-ID continues where it left off.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '-1'
+    after_seq = int(last_event_id) if last_event_id.lstrip('-').isdigit() else -1
+
+    def stream():
+        yield sse_event("job", {"job_id": job.id, "kind": job.kind, "status": job.status})
+        for seq, event, data in job.follow(after_seq, idle_timeout=15):
+            yield f"id: {seq}\n" + sse_event(event, data)
+
+    return streaming_response('jobs', stream())
+
 
-    try:
-        data = request.get_json()
-        user_message = data.get('message', '')
-        chat_history = data.get('history', [])
-        deep_mode = data.get('deepMode', False)  # New: multi-agent analysis
+@app.route('/jobs/stats')
+def job_stats():
+    """
+    Background job counts by status, queue limits and lifetime counters
+    """
+    return jsonify(jobs.snapshot())
 
-        if not user_message:
-            return jsonify({"error": "No message provided"}), 400
 
-        # OPTION 1: Multi-Agent Deep Analysis Mode
-        if deep_mode:
-            return _deep_analysis_chat(user_message, chat_history)
-        
-        # OPTION 2: Enhanced Single Model (Default Mode)
-        # Build conversation history with upgraded system prompt
-        messages = [
-            {
-                "role": "system",
-                "content": """You are "Aura," an elite fragrance curator and perfumery expert with deep knowledge of:
+# Fixed curator prefix: identical on every turn so the provider can reuse it
+CURATOR_SYSTEM_PROMPT = """You are "Aura," an elite fragrance curator and perfumery expert with deep knowledge of:
 
 **Fragrance Families & Classifications:**
 - Floral (Soliflore, Floral Bouquet, Soft Floral)
@@ -577,43 +3811,263 @@ def chat():
 - Share fascinating perfumery insights when relevant
 
 Be warm, conversational, and enthusiastic. Give actionable recommendations with specific fragrance examples when possible."""
+
+# Few-shot example for better accuracy
+CURATOR_FEW_SHOT = [
+    {
+        "role": "user",
+        "content": "I need a confidence-boosting fragrance for important business meetings"
+    },
+    {
+        "role": "assistant",
+        "content": "For commanding presence in business settings, I'd recommend:\n\n1. **Tom Ford Oud Wood** - Woody oriental with oud, sandalwood, and tonka. Projects quiet authority without overwhelming. Perfect for boardrooms.\n\n2. **Creed Aventus** - Fresh fruity with pineapple, birch, and musk. Universally respected, confidence in a bottle.\n\n3. **Dior Sauvage** - Fresh spicy with bergamot and pepper. Clean, powerful, memorable.\n\nAll three have excellent longevity (6-8 hours) and moderate projection - noticed but not invasive. Which style resonates with you: the mysterious depth of oud, the fresh success energy of Aventus, or the clean power of Sauvage?"
+    }
+]
+
+
+class ChatSession:
+    __slots__ = ("id", "turns", "pending", "summary", "folding", "updated", "lock")
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.turns = deque()  # (role, content) kept verbatim, oldest first
+        self.pending = []  # turns being folded; still prompted until the summary lands
+        self.summary = ""
+        self.folding = False
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ChatSessionStore:
+    """
+    Server-side curator conversations with LRU and idle-TTL eviction.
+    Each prompt is the fixed system prompt and few-shot block, then a rolling
+    summary of older turns, then as many recent turns as fit `history_tokens`.
+    Turns that fall out of the window are folded into the summary off the
+    request path, so per-turn input size stays flat however long the chat runs.
+    Until a fold's summary is installed its turns stay in the prompt verbatim.
+    """
+
+    def __init__(self, max_sessions, ttl, history_tokens, summary_workers=2):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.history_tokens = history_tokens
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)
+        # Summaries are background work; keep them off the agent pool that serves requests
+        self._executor = ThreadPoolExecutor(max_workers=summary_workers, thread_name_prefix='aura-chat-summary')
+
+    def is_live(self, session_id):
+        """
+        Whether `session_id` names a session that is still held and not expired.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is not None and time.monotonic() - session.updated <= self.ttl
+
+    def get(self, session_id=None, history=None):
+        """
+        Returns the session for `session_id`, creating it (seeded from a
+        client-supplied `history`, if any) when it is unknown or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id) if session_id else None
+            if session and now - session.updated > self.ttl:
+                del self._sessions[session_id]
+                self.stats["expired"] += 1
+                session = None
+            if session:
+                self._sessions.move_to_end(session_id)
+                self.stats["resumed"] += 1
+            else:
+                session = ChatSession(session_id or uuid.uuid4().hex)
+                self._sessions[session.id] = session
+                self.stats["created"] += 1
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.stats["evicted"] += 1
+            session.updated = now
+        if history and not session.turns and not session.pending and not session.summary:
+            with session.lock:
+                session.turns.extend(
+                    (msg.get("role"), msg.get("content")) for msg in history
+                    if msg.get("role") in ("user", "assistant") and msg.get("content")
+                )
+            self._fold(session)
+        return session
+
+    def messages(self, session, user_message):
+        """
+        Builds the completion messages for the next curator turn.
+        """
+        messages = [{"role": "system", "content": CURATOR_SYSTEM_PROMPT}, *CURATOR_FEW_SHOT]
+        with session.lock:
+            if session.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{session.summary}"})
+            messages.extend({"role": role, "content": content} for role, content in (*session.pending, *session.turns))
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def recent(self, session, turns=3):
+        """
+        The last few turns as role/content dicts, for prompts that quote context.
+        """
+        with session.lock:
+            return [{"role": role, "content": content} for role, content in list(session.turns)[-turns:]]
+
+    def record(self, session, user_message, response):
+        with session.lock:
+            session.turns.append(("user", user_message))
+            session.turns.append(("assistant", response))
+        session.updated = time.monotonic()
+        self._fold(session)
+
+    def _fold(self, session):
+        """
+        Moves turns that no longer fit the budget out of the window into the
+        session's pending buffer and summarizes them in the background (one
+        fold per session at a time).
+        """
+        with session.lock:
+            used = sum(estimate_tokens(content) for _, content in session.turns)
+            overflow = []
+            # Always keep the latest exchange verbatim
+            while used > self.history_tokens and len(session.turns) > 2:
+                role, content = session.turns.popleft()
+                used -= estimate_tokens(content)
+                overflow.append((role, content))
+            if not overflow:
+                return
+            if session.folding:
+                # A fold is already running; queue these for the next one
+                session.turns.extendleft(reversed(overflow))
+                return
+            session.folding = True
+            session.pending = overflow
+        with self._lock:
+            self.stats["folds"] += 1
+        self._executor.submit(self._summarize, session, overflow)
+
+    def _summarize(self, session, overflow):
+        transcript = "\n".join(f"{role.upper()}: {content}" for role, content in overflow)
+        try:
+            summary = run_agent(
+                model=model_router.model("chat_summary"),
+                task="chat_summary",
+                messages=[{"role": "user", "content": f"""Update the running summary of a fragrance consultation.
+
+CURRENT SUMMARY: {session.summary or 'None yet'}
+
+NEW TURNS:
+{transcript}
+
+Keep the customer's stated preferences, dislikes, budget, occasions and every fragrance already recommended.
+Reply with the updated summary only, in at most 120 words."""}],
+                temperature=0.2,
+                max_tokens=250,
+                priority=PRIORITY_BATCH,
+            )
+        except Exception as e:
+            # Fall back to clipped turns so the context is not lost outright
+            print(f"Chat summary failed for session {session.id}: {e}")
+            with self._lock:
+                self.stats["fold_errors"] += 1
+            summary = " ".join(filter(None, [session.summary, *(f"{role}: {content[:160]}" for role, content in overflow)]))
+            summary = summary[-self.history_tokens * 2:]
+        with session.lock:
+            session.summary = summary
+            session.pending = []
+            session.folding = False
+        self._fold(session)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+                "history_tokens": self.history_tokens,
+                **self.stats,
             }
-        ]
-        
-        # Add few-shot examples for better accuracy
-        if not chat_history:
-            messages.extend([
-                {
-                    "role": "user",
-                    "content": "I need a confidence-boosting fragrance for important business meetings"
-                },
-                {
-                    "role": "assistant",
-                    "content": "For commanding presence in business settings, I'd recommend:\n\n1. **Tom Ford Oud Wood** - Woody oriental with oud, sandalwood, and tonka. Projects quiet authority without overwhelming. Perfect for boardrooms.\n\n2. **Creed Aventus** - Fresh fruity with pineapple, birch, and musk. Universally respected, confidence in a bottle.\n\n3. **Dior Sauvage** - Fresh spicy with bergamot and pepper. Clean, powerful, memorable.\n\nAll three have excellent longevity (6-8 hours) and moderate projection - noticed but not invasive. Which style resonates with you: the mysterious depth of oud, the fresh success energy of Aventus, or the clean power of Sauvage?"
-                }
-            ])
-        
-        # Add actual chat history
-        for msg in chat_history:
-            messages.append({"role": msg.get("role"), "content": msg.get("content")})
+
+
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.getenv('AURA_CHAT_MAX_SESSIONS', '1000')),
+    ttl=float(os.getenv('AURA_CHAT_SESSION_TTL', str(6 * 3600))),
+    history_tokens=int(os.getenv('AURA_CHAT_HISTORY_TOKENS', '1500')),
+    summary_workers=int(os.getenv('AURA_CHAT_SUMMARY_WORKERS', '2')),
+)
+
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    """
+    Curator mode: conversational fragrance recommendations
+    Supports both standard and deep analysis modes.
+    Conversations are kept server-side under `session_id`; a client-supplied
+    `history` only seeds a new session. An unknown or expired `session_id`
+    sent without `history` gets a 409 with `session_reset` so the client can
+    resend its transcript instead of losing the context.
+    """
+    if not client:
+        return jsonify({"error": "Groq client not initialized. Please check your API key."}), 500
+
+    try:
+        data = request.get_json()
+        user_message = data.get('message', '')
+        deep_mode = data.get('deepMode', False)  # New: multi-agent analysis
+
+        if not user_message:
+            return jsonify({"error": "No message provided"}), 400
+
+        history = data.get('history') or []
+        if not isinstance(history, list) or not all(isinstance(msg, dict) for msg in history):
+            return jsonify({"error": "history must be a list of {role, content} objects"}), 400
+        session_id = data.get('session_id')
+        if session_id is not None and not isinstance(session_id, str):
+            return jsonify({"error": "session_id must be a string"}), 400
+        if history and history[-1].get('role') == 'user' and history[-1].get('content') == user_message:
+            history = history[:-1]
+        if session_id and not history and not chat_sessions.is_live(session_id):
+            return jsonify({
+                "error": "Unknown or expired session; resend with history to restore it",
+                "session_reset": True,
+            }), 409
+        session = chat_sessions.get(session_id, history)
+
+        # OPTION 1: Multi-Agent Deep Analysis Mode
+        if deep_mode:
+            return _deep_analysis_chat(user_message, session, stream=data.get('stream', False), model_tier=data.get('model_tier'))
         
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        # OPTION 2: Enhanced Single Model (Default Mode)
+        with span("history"):
+            messages = chat_sessions.messages(session, user_message)
+
+        model = model_router.model("chat", data.get('model_tier'))
+
+        if data.get('stream', False):
+            return streaming_response('chat', _stream_chat(user_message, session, messages, model))
 
         # Upgraded: llama-3.3-70b (same as Story Builder) + increased tokens
-        chat_completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        chat_completion = create_completion(
+            priority=PRIORITY_INTERACTIVE,
+            task="chat",
+            model=model,
             messages=messages,
             temperature=0.7,
             max_tokens=1024,  # Doubled for better explanations
         )
 
         ai_response = chat_completion.choices[0].message.content.strip()
+        chat_sessions.record(session, user_message, ai_response)
         
         return jsonify({
             "response": ai_response,
             "success": True,
-            "mode": "enhanced"
+            "mode": "enhanced",
+            "session_id": session.id
         })
 
     except Exception as e:
@@ -622,14 +4076,150 @@ Be warm, conversational, and enthusiastic. Give actionable recommendations with
         return jsonify({"error": "An error occurred during chat. Please try again."}), 500
 
 
-def _deep_analysis_chat(user_message, chat_history):
+def _stream_chat(user_message, session, messages, model):
+    """
+    Streams a standard-mode curator answer as `token` events, closing with a
+    `done` event that carries the same fields as the JSON response plus `timings`.
+    """
+    started = time.perf_counter()
+    timings = {}
+    response = []
+    try:
+        upstream = UpstreamCancel()
+        for part in coalesce_tokens('chat', stream_agent(
+            model=model,
+            task="chat",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=1024,
+            priority=PRIORITY_INTERACTIVE,
+            cancel=upstream,
+        ), upstream):
+            if not response:
+                timings["first_token"] = round((time.perf_counter() - started) * 1000)
+            response.append(part)
+            yield sse_event("token", {"token": part})
+        timings["total"] = round((time.perf_counter() - started) * 1000)
+
+        ai_response = "".join(response).strip()
+        if not ai_response:
+            yield sse_event("error", {"error": "An error occurred during chat. Please try again."})
+            return
+        chat_sessions.record(session, user_message, ai_response)
+
+        yield sse_event("done", {
+            "response": ai_response,
+            "success": True,
+            "mode": "enhanced",
+            "timings": timings,
+            "session_id": session.id
+        })
+    except Exception as e:
+        print(f"Error in chat stream: {e}")
+        print(traceback.format_exc())
+        yield sse_event("error", {"error": "An error occurred during chat. Please try again."})
+
+
+@app.route('/chat/sessions/stats')
+def chat_sessions_stats():
+    """
+    Live session count plus creation, eviction and history-folding counters
+    """
+    return jsonify(chat_sessions.snapshot())
+
+
+def _deep_analysis_chat(user_message, session, stream=False, model_tier=None):
     """
     Multi-agent deep analysis for complex fragrance recommendations
-    Uses 3 specialized agents similar to AI Lab architecture
+    Uses 3 specialized agents similar to AI Lab architecture.
+    The perfumer and stylist run concurrently; with `stream` the curator's
+    answer is streamed token-by-token after the two analyses are sent as events.
+    """
+    try:
+        agents = _deep_analysis_agents(user_message, chat_sessions.recent(session), model_tier)
+
+        if stream:
+            return streaming_response('chat', _stream_deep_analysis(user_message, agents, session, model_tier))
+
+        results, errors, timings = run_agents_concurrently(agents)
+        if not results:
+            raise RuntimeError(f"All deep analysis agents failed: {errors}")
+
+        final_recommendation = run_agent(**_curator_agent(user_message, results, model_tier))
+        chat_sessions.record(session, user_message, final_recommendation)
+
+        return jsonify({
+            "response": final_recommendation,
+            "success": True,
+            "mode": "deep",
+            "analysis": {
+                "expert": results.get("expert"),
+                "stylist": results.get("stylist")
+            },
+            "session_id": session.id
+        })
+
+    except Exception as e:
+        print(f"Error in deep analysis: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Deep analysis failed. Please try standard mode."}), 500
+
+
+def _stream_deep_analysis(user_message, agents, session, model_tier=None):
+    """
+    Emits `expert` and `stylist` events as each analysis lands, then streams the
+    curator's recommendation as `token` events and closes with `done`.
     """
+    started = time.perf_counter()
+    results, timings = {}, {}
     try:
-        # Agent 1: Fragrance Expert - Technical knowledge
-        expert_prompt = f"""You are a Master Perfumer with 30 years of experience in fragrance composition.
+        for name, result, error, elapsed_ms in iter_agents_concurrently(agents):
+            timings[name] = elapsed_ms
+            if not error:
+                results[name] = result
+            yield sse_event(name, {"content": result, "error": error, "elapsed_ms": elapsed_ms})
+
+        if not results:
+            yield sse_event("error", {"error": "Deep analysis failed. Please try standard mode."})
+            return
+
+        t0 = time.perf_counter()
+        response = []
+        upstream = UpstreamCancel()
+        for part in coalesce_tokens('chat', stream_agent(cancel=upstream, **_curator_agent(user_message, results, model_tier)), upstream):
+            if not response:
+                timings["curator_first_token"] = round((time.perf_counter() - t0) * 1000)
+            response.append(part)
+            yield sse_event("token", {"token": part})
+        timings["curator"] = round((time.perf_counter() - t0) * 1000)
+        timings["total"] = round((time.perf_counter() - started) * 1000)
+        final_recommendation = "".join(response).strip()
+        chat_sessions.record(session, user_message, final_recommendation)
+
+        yield sse_event("done", {
+            "response": final_recommendation,
+            "success": True,
+            "mode": "deep",
+            "analysis": {
+                "expert": results.get("expert"),
+                "stylist": results.get("stylist")
+            },
+            "timings": timings,
+            "session_id": session.id
+        })
+    except Exception as e:
+        print(f"Error in deep analysis stream: {e}")
+        print(traceback.format_exc())
+        yield sse_event("error", {"error": "Deep analysis failed. Please try standard mode."})
+
+
+def _deep_analysis_agents(user_message, chat_history, model_tier=None):
+    """
+    Builds the two independent deep-mode analysis agents, keyed by result name.
+    """
+    model = model_router.model("analysis", model_tier)
+    # Agent 1: Fragrance Expert - Technical knowledge
+    expert_prompt = f"""You are a Master Perfumer with 30 years of experience in fragrance composition.
 
 USER QUERY: {user_message}
 
@@ -643,16 +4233,8 @@ Analyze this query from a technical perfumery perspective:
 
 Provide expert analysis in 3-4 sentences."""
 
-        expert_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": expert_prompt}],
-            temperature=0.6,
-            max_tokens=400,
-        )
-        expert_analysis = expert_response.choices[0].message.content.strip()
-
-        # Agent 2: Personal Stylist - Lifestyle & personality matching
-        stylist_prompt = f"""You are an elite Personal Fragrance Stylist who matches scents to personalities and lifestyles.
+    # Agent 2: Personal Stylist - Lifestyle & personality matching
+    stylist_prompt = f"""You are an elite Personal Fragrance Stylist who matches scents to personalities and lifestyles.
 
 USER QUERY: {user_message}
 
@@ -666,22 +4248,38 @@ Analyze this query from a personality and lifestyle perspective:
 
 Provide lifestyle analysis in 3-4 sentences."""
 
-        stylist_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": stylist_prompt}],
-            temperature=0.7,
-            max_tokens=400,
-        )
-        stylist_analysis = stylist_response.choices[0].message.content.strip()
-
-        # Agent 3: Curator - Synthesize and recommend
-        curator_prompt = f"""You are "Aura," the ultimate fragrance curator synthesizing expert insights into perfect recommendations.
+    return {
+        "expert": {
+            "model": model,
+            "task": "analysis",
+            "messages": [{"role": "user", "content": expert_prompt}],
+            "temperature": 0.6,
+            "max_tokens": 400,
+            "priority": PRIORITY_INTERACTIVE,
+        },
+        "stylist": {
+            "model": model,
+            "task": "analysis",
+            "messages": [{"role": "user", "content": stylist_prompt}],
+            "temperature": 0.7,
+            "max_tokens": 400,
+            "priority": PRIORITY_INTERACTIVE,
+        },
+    }
+
+
+def _curator_agent(user_message, results, model_tier=None):
+    """
+    Builds the curator agent that synthesizes the perfumer and stylist analyses.
+    """
+    # Agent 3: Curator - Synthesize and recommend
+    curator_prompt = f"""You are "Aura," the ultimate fragrance curator synthesizing expert insights into perfect recommendations.
 
 USER QUERY: {user_message}
 
-PERFUMER ANALYSIS: {expert_analysis}
+PERFUMER ANALYSIS: {results.get("expert", "Not available")}
 
-STYLIST ANALYSIS: {stylist_analysis}
+STYLIST ANALYSIS: {results.get("stylist", "Not available")}
 
 Based on these expert insights, provide:
 1. 3-4 specific fragrance recommendations (name the actual perfumes)
@@ -690,28 +4288,14 @@ Based on these expert insights, provide:
 
 Be warm, enthusiastic, and actionable. Format beautifully with clear sections."""
 
-        curator_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": curator_prompt}],
-            temperature=0.8,
-            max_tokens=800,
-        )
-        final_recommendation = curator_response.choices[0].message.content.strip()
-
-        return jsonify({
-            "response": final_recommendation,
-            "success": True,
-            "mode": "deep",
-            "analysis": {
-                "expert": expert_analysis,
-                "stylist": stylist_analysis
-            }
-        })
-
-    except Exception as e:
-        print(f"Error in deep analysis: {e}")
-        print(traceback.format_exc())
-        return jsonify({"error": "Deep analysis failed. Please try standard mode."}), 500
+    return {
+        "model": model_router.model("synthesis", model_tier),
+        "task": "synthesis",
+        "messages": [{"role": "user", "content": curator_prompt}],
+        "temperature": 0.8,
+        "max_tokens": 800,
+        "priority": PRIORITY_INTERACTIVE,
+    }
 
 
 @app.route('/export-pdf', methods=['POST'])
@@ -788,7 +4372,8 @@ def export_pdf():
                     story.append(Paragraph(clean_text.strip(), body_style))
         
         # Build PDF
-        doc.build(story)
+        with span("pdf.build"):
+            doc.build(story)
         buffer.seek(0)
         
         return send_file(
@@ -845,8 +4430,9 @@ Story: {story_content[:400]}...
 Make it conversational and include a call-to-action."""
         
         # Generate using llama model (creative writing)
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = create_completion(
+            task="social_caption",
+            model=model_router.model("social_caption", data.get('model_tier')),
             messages=[
                 {"role": "system", "content": "You are a social media expert for luxury fragrance brands. Create engaging, concise posts that drive engagement."},
                 {"role": "user", "content": prompt}
@@ -869,89 +4455,356 @@ Make it conversational and include a call-to-action."""
         return jsonify({"error": "Failed to generate social media post"}), 500
 
 
+_WORD_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+(.*)$")
+_BULLET_RE = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s+")
+_SENTENCE_RE = re.compile(r"[.!?]+(?=\s|$)")
+_MARKDOWN_RE = re.compile(r"[*_`>#\[\]()]")
+
+
+def _measure(stem):
+    """
+    Porter's m: the number of vowel-consonant runs in a stem ("not" 1, "perfum" 2).
+    """
+    pattern = ''.join('v' if c in 'aeiou' or (c == 'y' and i and stem[i - 1] not in 'aeiou') else 'c' for i, c in enumerate(stem))
+    return pattern.count('vc')
+
+
+def _ends_cvc(stem):
+    return (len(stem) >= 3 and stem[-1] not in 'aeiouwxy' and stem[-2] in 'aeiouy'
+            and stem[-3] not in 'aeiou')
+
+
+def _stem(word):
+    """
+    Small Porter-style stemmer so "scents"/"scented" count towards "scent" and
+    "fragrances" towards "fragrance", while "notes" and "noted" stay clear of "not".
+    Strips one plural (-es only after a sibilant), then one of -ing/-ed/-ness/-ly,
+    restoring the e of short stems, and finally drops a trailing e from long stems.
+    """
+    if len(word) <= 3:
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        word = word[:-3] + 'y'
+    elif word.endswith(('sses', 'xes', 'zes', 'ches', 'shes')):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+    for suffix in ('ing', 'ed', 'ness', 'ly'):
+        stem = word[:-len(suffix)]
+        if word.endswith(suffix) and len(stem) >= 3 and any(c in 'aeiouy' for c in stem):
+            if suffix in ('ing', 'ed'):
+                if stem[-1] == stem[-2] and stem[-1] not in 'lsz':
+                    stem = stem[:-1]
+                elif _measure(stem) == 1 and _ends_cvc(stem):
+                    stem += 'e'
+            word = stem
+            break
+    if word.endswith('e') and _measure(word[:-1]) > 1:
+        word = word[:-1]
+    return word
+
+
+def _tokenize(text):
+    return [word.lower() for word in _WORD_RE.findall(text)]
+
+
+def _syllables(word):
+    groups = re.findall(r"[aeiouy]+", word)
+    count = len(groups)
+    if word.endswith('e') and not word.endswith(('le', 'ee')) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def _phrase_count(stems, phrase):
+    n = len(phrase)
+    if not n:
+        return 0
+    return sum(1 for i in range(len(stems) - n + 1) if stems[i:i + n] == phrase)
+
+
+def _readability_label(flesch):
+    if flesch >= 70:
+        return "easy"
+    if flesch >= 60:
+        return "plain English"
+    if flesch >= 50:
+        return "fairly difficult"
+    if flesch >= 30:
+        return "difficult"
+    return "very difficult"
+
+
+def compute_seo_metrics(content, keywords='', fragrance_name=''):
+    """
+    Deterministic SEO metrics for a product description: length, keyword
+    density and placement (stemmed, phrase-aware), heading/bullet structure,
+    paragraph length, Flesch reading ease and a 0-100 score. Pure Python,
+    no model call. Falls back to the fragrance name when no keywords are given.
+    """
+    lines = content.splitlines()
+    headings = [m.group(1).strip() for m in (_HEADING_RE.match(line) for line in lines) if m]
+    bullets = sum(1 for line in lines if _BULLET_RE.match(line))
+
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", content):
+        prose = [line for line in block.splitlines() if line.strip() and not _HEADING_RE.match(line)]
+        if prose:
+            paragraphs.append(' '.join(prose))
+    paragraph_words = [len(_tokenize(p)) for p in paragraphs] or [0]
+
+    prose_text = _MARKDOWN_RE.sub(' ', '\n'.join(paragraphs))
+    words = _tokenize(prose_text)
+    word_count = len(_tokenize(_MARKDOWN_RE.sub(' ', content)))
+    sentence_count = max(1, len([s for s in _SENTENCE_RE.split(prose_text) if _tokenize(s)]))
+    syllable_count = sum(_syllables(word) for word in words)
+    flesch = 206.835 - 1.015 * (len(words) / sentence_count) - 84.6 * (syllable_count / len(words)) if words else 0.0
+
+    stems = [_stem(word) for word in words]
+    opening = [_stem(word) for word in _tokenize(paragraphs[0] if paragraphs else '')]
+    heading_stems = [[_stem(word) for word in _tokenize(heading)] for heading in headings]
+    targets = [k.strip() for k in (keywords or '').split(',') if k.strip()] or ([fragrance_name] if fragrance_name else [])
+    keyword_metrics = []
+    for keyword in targets:
+        phrase = [_stem(word) for word in _tokenize(keyword)]
+        occurrences = _phrase_count(stems, phrase)
+        keyword_metrics.append({
+            "keyword": keyword,
+            "occurrences": occurrences,
+            "density": round(100 * occurrences * len(phrase) / len(words), 2) if words else 0.0,
+            "in_opening": _phrase_count(opening, phrase) > 0,
+            "in_headings": sum(1 for h in heading_stems if _phrase_count(h, phrase)),
+        })
+
+    # Length: 300-500 words is the e-commerce sweet spot (25 pts)
+    if word_count < 300:
+        length_points = 25 * word_count / 300
+    else:
+        length_points = max(0.0, 25 - max(0, word_count - 500) / 20)
+    # Keywords: healthy density, early placement, heading presence (30 pts)
+    if keyword_metrics:
+        keyword_points = sum(
+            (15 if 0.5 <= k["density"] <= 2.5 else 7 if k["occurrences"] else 0)
+            + (10 if k["in_opening"] else 0)
+            + (5 if k["in_headings"] else 0)
+            for k in keyword_metrics
+        ) / len(keyword_metrics)
+    else:
+        keyword_points = 15
+    # Structure: headings, bullets, short paragraphs (20 pts)
+    structure_points = (10 if len(headings) >= 2 else 5 if headings else 0) \
+        + (5 if bullets else 0) \
+        + (5 if max(paragraph_words) <= 80 else 2 if max(paragraph_words) <= 120 else 0)
+    # Readability: Flesch 60+ reads comfortably (25 pts)
+    readability_points = 25 * min(1.0, max(0.0, flesch) / 60)
+    score = round(length_points + keyword_points + structure_points + readability_points)
+
+    keyword_notes = []
+    for k in keyword_metrics:
+        placement = "in the opening paragraph" if k["in_opening"] else "missing from the opening paragraph"
+        if k["in_headings"]:
+            placement += f" and {k['in_headings']} heading(s)"
+        keyword_notes.append(f"'{k['keyword']}' appears {k['occurrences']}x ({k['density']}% density), {placement}.")
+    keyword_analysis = ' '.join(keyword_notes) or "No target keywords provided."
+
+    if 300 <= word_count <= 500:
+        length_analysis = f"{word_count} words - within the 300-500 word range for product pages."
+    elif word_count < 300:
+        length_analysis = f"{word_count} words - {300 - word_count} short of the 300-word minimum for product pages."
+    else:
+        length_analysis = f"{word_count} words - {word_count - 500} over the 500-word ideal for product pages."
+
+    avg_paragraph = round(sum(paragraph_words) / len(paragraph_words))
+    readability = (
+        f"Flesch reading ease {round(flesch)} ({_readability_label(flesch)}); "
+        f"{len(headings)} heading(s), {bullets} bullet(s), paragraphs average {avg_paragraph} words."
+    )
+
+    suggestions = []
+    for k in keyword_metrics:
+        if not k["occurrences"]:
+            suggestions.append(f"Work '{k['keyword']}' into the copy - it does not appear yet.")
+        elif k["density"] > 2.5:
+            suggestions.append(f"Ease off '{k['keyword']}' ({k['density']}% density reads as keyword stuffing; aim for 0.5-2.5%).")
+        elif not k["in_opening"]:
+            suggestions.append(f"Mention '{k['keyword']}' in the opening paragraph.")
+    if word_count < 300:
+        suggestions.append("Expand the description towards 300-500 words, e.g. by detailing each note layer.")
+    elif word_count > 500:
+        suggestions.append("Tighten the description to 500 words or fewer for product pages.")
+    if len(headings) < 2:
+        suggestions.append("Add ### headings (e.g. The Story, The Notes, The Essence) so the page is scannable.")
+    if not bullets:
+        suggestions.append("Present the note pyramid as bullet points.")
+    if max(paragraph_words) > 80:
+        suggestions.append("Split long paragraphs into 2-3 sentence blocks.")
+    if flesch < 50:
+        suggestions.append("Shorten sentences and prefer simpler words to improve readability.")
+
+    return {
+        "score": max(0, min(100, score)),
+        "score_breakdown": {
+            "length": round(length_points, 1),
+            "keywords": round(keyword_points, 1),
+            "structure": structure_points,
+            "readability": round(readability_points, 1),
+        },
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "paragraph_count": len(paragraphs),
+        "avg_paragraph_words": avg_paragraph,
+        "max_paragraph_words": max(paragraph_words),
+        "headings": headings,
+        "bullet_count": bullets,
+        "flesch_reading_ease": round(flesch, 1),
+        "keywords": keyword_metrics,
+        "keyword_analysis": keyword_analysis,
+        "length_analysis": length_analysis,
+        "readability": readability,
+        "suggestions": suggestions[:5] or ["Content meets the core on-page SEO checks - keep it updated."],
+    }
+
+
+def extract_json(text):
+    """
+    Parses JSON from model output, tolerating ```json fences.
+    """
+    if '```json' in text:
+        start = text.find('```json') + 7
+        text = text[start:text.find('```', start)]
+    elif '```' in text:
+        start = text.find('```') + 3
+        text = text[start:text.find('```', start)]
+    return json.loads(text.strip())
+
+
 @app.route('/seo-analysis', methods=['POST'])
 def analyze_seo():
     """
     Analyze fragrance story for SEO and provide optimization suggestions
+    Metrics and score are computed locally; the model only writes the
+    free-text suggestions and is skipped with "suggestions": false.
     """
-    if not client:
-        return jsonify({"error": "Groq client not initialized"}), 500
-    
     try:
         data = request.get_json()
         fragrance_name = data.get('name', 'Fragrance')
         story_content = data.get('content', '')
         target_keywords = data.get('keywords', '')
         
-        # Calculate word count
-        word_count = len(story_content.split())
+        analysis_data = compute_seo_metrics(story_content, target_keywords, fragrance_name)
         
-        # Prepare SEO analysis prompt
-        prompt = f"""Analyze this fragrance product description for SEO optimization.
-
-Fragrance Name: {fragrance_name}
-Target Keywords: {target_keywords or 'Not specified'}
-Content Length: {word_count} words
-Content: {story_content}
-
-Provide:
-1. **SEO Score** (0-100) with brief justification
-2. **Keyword Analysis**: Are target keywords naturally integrated? Mention density and placement.
-3. **Content Length**: Is it optimal for search engines? (300-500 words ideal for e-commerce)
-4. **Readability**: Is it engaging and scannable? Check for headers, bullets, paragraph length.
-5. **Top 3 Optimization Suggestions** (specific, actionable improvements)
-
-Format as JSON with keys: score, keyword_analysis, length_analysis, readability, suggestions (array), word_count"""
+        cache_hit = None
+        if data.get('suggestions', True) and client:
+            try:
+                suggestions, cache_hit = _seo_suggestions(fragrance_name, story_content, analysis_data, cache_bypassed(data), data.get('model_tier'))
+                if suggestions:
+                    analysis_data['suggestions'] = suggestions
+            except Exception as e:
+                print(f"SEO suggestions unavailable, keeping rule-based suggestions: {e}")
         
-        # Generate SEO analysis
-        completion = client.chat.completions.create(
-            model="groq/compound",  # Use web-search model for SEO best practices
-            messages=[
-                {"role": "system", "content": "You are an SEO expert specializing in e-commerce product descriptions. Analyze content and provide data-driven optimization recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,  # Lower temperature for analytical consistency
-            max_tokens=800,
-        )
+        response = jsonify({
+            "success": True,
+            "analysis": analysis_data
+        })
+        if cache_hit is not None:
+            response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        return response
         
-        analysis_text = completion.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"Error analyzing SEO: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Failed to analyze SEO"}), 500
+
+
+def _scoring_batch_items(body, fields):
+    """
+    Validates a {"items": [...]} scoring batch. Returns (items, None), or
+    (None, error message) naming the first offending item index.
+    """
+    if not isinstance(body, dict):
+        return None, "Request body must be a JSON object"
+    items = body.get('items') or []
+    if not isinstance(items, list):
+        return None, "items must be a list of objects"
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, f"At most {BATCH_MAX_ITEMS} items per request"
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            return None, f"items[{index}] must be an object"
+        for field in fields:
+            if not isinstance(item.get(field, ''), str):
+                return None, f"items[{index}].{field} must be a string"
+    return items, None
+
+
+@app.route('/seo-analysis/batch', methods=['POST'])
+def analyze_seo_batch():
+    """
+    Local SEO metrics for a whole catalog in one request (no model calls)
+    Body: {"items": [{"name", "content", "keywords"}, ...]}
+    """
+    try:
+        items, error = _scoring_batch_items(request.get_json(silent=True), ('name', 'content', 'keywords'))
+        if error:
+            return jsonify({"error": error}), 400
         
-        # Try to parse JSON response, fallback to text if needed
-        try:
-            # Extract JSON from potential markdown code blocks
-            if '```json' in analysis_text:
-                json_start = analysis_text.find('```json') + 7
-                json_end = analysis_text.find('```', json_start)
-                analysis_text = analysis_text[json_start:json_end].strip()
-            elif '```' in analysis_text:
-                json_start = analysis_text.find('```') + 3
-                json_end = analysis_text.find('```', json_start)
-                analysis_text = analysis_text[json_start:json_end].strip()
-            
-            import json
-            analysis_data = json.loads(analysis_text)
-            analysis_data['word_count'] = word_count
-        except:
-            # Fallback: return as structured text
-            analysis_data = {
-                "score": 75,
-                "keyword_analysis": "Analysis completed",
-                "length_analysis": "See detailed report",
-                "readability": "See detailed report",
-                "suggestions": ["Review the detailed analysis below"],
-                "raw_analysis": analysis_text,
-                "word_count": word_count
+        started = time.perf_counter()
+        results = [
+            {
+                "name": item.get('name', 'Fragrance'),
+                **compute_seo_metrics(item.get('content', ''), item.get('keywords', ''), item.get('name', ''))
             }
+            for item in items
+        ]
         
         return jsonify({
             "success": True,
-            "analysis": analysis_data
+            "count": len(results),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "results": results
         })
         
     except Exception as e:
-        print(f"Error analyzing SEO: {e}")
+        print(f"Error in batch SEO analysis: {e}")
         print(traceback.format_exc())
-        return jsonify({"error": "Failed to analyze SEO"}), 500
+        return jsonify({"error": "Failed to analyze SEO batch"}), 500
+
+
+def _seo_suggestions(fragrance_name, story_content, metrics, bypass=False, model_tier=None):
+    """
+    Asks the model for three free-text suggestions grounded in the local metrics.
+    Returns (suggestions, cache_hit).
+    """
+    prompt = f"""Suggest SEO improvements for this fragrance product description.
+
+Fragrance Name: {fragrance_name}
+Measured metrics (authoritative, do not recompute):
+- SEO score: {metrics['score']}/100
+- {metrics['length_analysis']}
+- Keywords: {metrics['keyword_analysis']}
+- Readability: {metrics['readability']}
+
+Content: {story_content}
+
+Return ONLY a JSON array of the top 3 specific, actionable optimization suggestions."""
+
+    suggestions_text, cache_hit = cached_completion(
+        'seo-analysis',
+        bypass=bypass,
+        task="analysis_json",
+        model=model_router.model("analysis_json", model_tier),
+        messages=[
+            {"role": "system", "content": "You are an SEO expert specializing in e-commerce product descriptions. Analyze content and provide data-driven optimization recommendations."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,  # Lower temperature for analytical consistency
+        max_tokens=300,
+    )
+    suggestions = extract_json(suggestions_text)
+    if isinstance(suggestions, dict):
+        suggestions = suggestions.get('suggestions')
+    return [str(s) for s in suggestions or []][:3], cache_hit
 
 
 @app.route('/optimize-seo', methods=['POST'])
@@ -990,8 +4843,9 @@ ORIGINAL CONTENT:
 Rewrite this as an SEO-optimized product description. Keep the essence but make it concise, structured, and search-engine friendly."""
         
         # Generate optimized content
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = create_completion(
+            task="seo_rewrite",
+            model=model_router.model("seo_rewrite", data.get('model_tier')),
             messages=[
                 {"role": "system", "content": "You are an expert copywriter specializing in SEO-optimized luxury fragrance descriptions. Create concise, structured, keyword-rich content that ranks well and converts."},
                 {"role": "user", "content": prompt}
@@ -1013,22 +4867,189 @@ Rewrite this as an SEO-optimized product description. Keep the essence but make
         return jsonify({"error": "Failed to optimize content"}), 500
 
 
+# Scent-psychology lexicons (stemmed at import) behind the four rubric dimensions
+PSYCHOLOGY_LEXICONS = {
+    "emotional_trigger": """
+        confidence confident romance romantic desire desirable passion passionate power powerful allure alluring
+        magnetic seduce seductive sensual intoxicating irresistible daring thrill tender intimate intimacy
+        longing yearn mystery mysterious joy joyful euphoria comfort comforting embrace electric captivating
+        addictive dangerous devotion bliss serenity calm yearning hypnotic
+    """,
+    "memory_activation": """
+        remember memory memories nostalgia nostalgic childhood remind reminiscent return transport transported
+        evoke evocative recall echo echoes once again first forever timeless linger lingering heritage
+        grandmother grandfather summers youth yesterday past familiar moment moments souvenir journey revisit
+    """,
+    "identity_connection": """
+        you your yourself signature identity statement express expression define defining essence presence
+        persona individual unique own authentic character aura command icon iconic legacy
+        become embody self bold rebel modern discerning sophisticated
+    """,
+}
+
+SENSE_LEXICONS = {
+    "sight": "golden gold amber glow glowing shimmer shimmering light dusk dawn sunlit sunset velvet crimson "
+             "emerald ivory pink rose-gold silver black white blue green bright luminous shadow color colour",
+    "touch": "silk silky soft skin warm warmth cool smooth velvety creamy powdery textured caress breeze "
+             "damp dry crisp heat touch",
+    "taste": "honey sweet sugar bitter juicy salty vanilla caramel praline chocolate cocoa coffee "
+             "cognac rum wine nectar delicious gourmand edible",
+    "sound": "whisper whispers hum crackle rustle silence quiet murmur melody song rhythm sigh hush",
+    "smell": "scent scents aroma fragrance fragrant note notes accord sillage trail perfume smell bouquet",
+}
+
+_PSYCHOLOGY_STEMS = {name: {_stem(w) for w in words.split()} for name, words in PSYCHOLOGY_LEXICONS.items()}
+_SENSE_STEMS = {sense: {_stem(w) for w in words.split()} for sense, words in SENSE_LEXICONS.items()}
+
+_PSYCHOLOGY_IMPROVEMENTS = {
+    "emotional_trigger": "Name the feeling the scent gives (confidence, seduction, comfort) rather than describing ingredients clinically.",
+    "memory_activation": "Anchor the scent to a remembered moment or place - a childhood summer, a first date, a return home.",
+    "identity_connection": "Speak to the wearer directly and frame the fragrance as their signature or statement.",
+    "sensory_integration": "Bring in sight, touch, taste and sound - colours, textures and flavours make the scent vivid.",
+}
+
+
+def _saturating(value, scale):
+    """Maps a non-negative feature onto 0..1 with diminishing returns."""
+    return 1 - math.exp(-value / scale) if value > 0 else 0.0
+
+
+def compute_psychology_features(content):
+    """
+    Lexical scent-psychology features for one copy: per-dimension hit density
+    (per 100 words), lexicon variety, senses covered and example sentences.
+    """
+    lines = [_BULLET_RE.sub('', line) for line in content.splitlines() if not _HEADING_RE.match(line)]
+    sentences = [re.sub(r"[*_`]", '', s).strip() for s in re.split(r"(?<=[.!?])\s+|\n+", '\n'.join(lines))]
+    sentences = [s for s in sentences if s]
+    stems = [_stem(word) for word in _tokenize(content)]
+    total = len(stems) or 1
+
+    features = {"word_count": len(stems)}
+    for name, lexicon in _PSYCHOLOGY_STEMS.items():
+        hits = [stem for stem in stems if stem in lexicon]
+        features[name] = {"density": 100 * len(hits) / total, "variety": len(set(hits)), "terms": sorted(set(hits))}
+    senses = {sense: sum(1 for stem in stems if stem in lexicon) for sense, lexicon in _SENSE_STEMS.items()}
+    features["sensory_integration"] = {
+        "density": 100 * sum(senses.values()) / total,
+        "variety": sum(1 for count in senses.values() if count),
+        "terms": sorted(sense for sense, count in senses.items() if count),
+    }
+
+    for name, feature in features.items():
+        if name == "word_count":
+            continue
+        lexicon = _PSYCHOLOGY_STEMS.get(name) or set().union(*_SENSE_STEMS.values())
+        feature["examples"] = [s for s in sentences if any(_stem(w) in lexicon for w in _tokenize(s))][:2]
+    return features
+
+
+def score_psychology(content):
+    """
+    Deterministic 0-25 scores for the four rubric dimensions plus an overall 0-100,
+    in the same shape as the /psychology-score response.
+    """
+    features = compute_psychology_features(content)
+    result = {}
+    for name in ("emotional_trigger", "memory_activation", "identity_connection"):
+        feature = features[name]
+        score = 25 * (0.6 * _saturating(feature["density"], 3) + 0.4 * _saturating(feature["variety"], 4))
+        result[name] = {"score": round(score), "terms": feature["terms"], "examples": feature["examples"]}
+    # Sensory integration rewards breadth across senses more than raw density
+    sensory = features["sensory_integration"]
+    score = 25 * (0.7 * min(1.0, sensory["variety"] / 4) + 0.3 * _saturating(sensory["density"], 6))
+    result["sensory_integration"] = {"score": round(score), "terms": sensory["terms"], "examples": sensory["examples"]}
+
+    data = {"overall_score": sum(d["score"] for d in result.values()), "word_count": features["word_count"]}
+    for name, dimension in result.items():
+        data[name] = {
+            "score": dimension["score"],
+            "strengths": dimension["examples"] or [],
+            "improvements": [] if dimension["score"] >= 18 else [_PSYCHOLOGY_IMPROVEMENTS[name]],
+            "signals": dimension["terms"],
+        }
+    weakest = sorted(result, key=lambda name: result[name]["score"])
+    data["top_3_enhancements"] = [_PSYCHOLOGY_IMPROVEMENTS[name] for name in weakest[:3]]
+    return data
+
+
 @app.route('/psychology-score', methods=['POST'])
 def psychology_score():
     """
     Analyze copy for psychological impact based on neuroscience research
-    Scores how well the copy leverages scent-emotion-memory connections
+    Scores how well the copy leverages scent-emotion-memory connections.
+    Dimension scores come from the local lexical scorer; the model only writes
+    the narrative insights and is skipped with "insights": false.
     """
-    if not client:
-        return jsonify({"error": "Groq client not initialized"}), 500
-    
     try:
         data = request.get_json()
         fragrance_name = data.get('name', 'Fragrance')
         copy_content = data.get('content', '')
         
-        # Psychology scoring prompt based on research
-        prompt = f"""As a neuroscience expert specializing in scent psychology, analyze this fragrance copy for psychological impact.
+        psychology_data = score_psychology(copy_content)
+        psychology_data["key_insights"] = None
+        
+        cache_hit = None
+        if data.get('insights', True) and client:
+            try:
+                insights, cache_hit = _psychology_insights(fragrance_name, copy_content, psychology_data, cache_bypassed(data), data.get('model_tier'))
+                psychology_data["key_insights"] = insights.get("key_insights")
+                if insights.get("top_3_enhancements"):
+                    psychology_data["top_3_enhancements"] = insights["top_3_enhancements"][:3]
+            except Exception as e:
+                print(f"Psychology insights unavailable, keeping lexical results: {e}")
+        
+        print(f"Psychology Score for '{fragrance_name}': {psychology_data.get('overall_score', 'N/A')}/100")
+        
+        response = jsonify({
+            "success": True,
+            "psychology_score": psychology_data
+        })
+        if cache_hit is not None:
+            response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        return response
+        
+    except Exception as e:
+        print(f"Error calculating psychology score: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Failed to calculate psychology score"}), 500
+
+
+@app.route('/psychology-score/batch', methods=['POST'])
+def psychology_score_batch():
+    """
+    Lexical psychology scores for a whole catalog in one request (no model calls)
+    Body: {"items": [{"name", "content"}, ...]}; `ranking` lists item indexes by overall score.
+    """
+    try:
+        items, error = _scoring_batch_items(request.get_json(silent=True), ('name', 'content'))
+        if error:
+            return jsonify({"error": error}), 400
+        
+        started = time.perf_counter()
+        results = [{"name": item.get('name', 'Fragrance'), **score_psychology(item.get('content', ''))} for item in items]
+        ranking = sorted(range(len(results)), key=lambda i: results[i]["overall_score"], reverse=True)
+        
+        return jsonify({
+            "success": True,
+            "count": len(results),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "ranking": ranking,
+            "results": results
+        })
+        
+    except Exception as e:
+        print(f"Error in batch psychology scoring: {e}")
+        print(traceback.format_exc())
+        return jsonify({"error": "Failed to calculate psychology scores"}), 500
+
+
+def _psychology_insights(fragrance_name, copy_content, scores, bypass=False, model_tier=None):
+    """
+    Asks the model for narrative insights on top of the lexical scores.
+    Returns ({key_insights, top_3_enhancements}, cache_hit).
+    """
+    prompt = f"""As a neuroscience expert specializing in scent psychology, interpret these measured scores for a fragrance copy.
 
 **SCIENTIFIC FRAMEWORK:**
 Based on Harvard and Psychology Today research:
@@ -1038,130 +5059,38 @@ Based on Harvard and Psychology Today research:
 4. **Color-scent synesthesia** → cross-sensory language enhances neural processing
 5. **Identity signaling** → fragrance choice reflects self-perception and aspirational identity
 
+**MEASURED SCORES (authoritative, do not rescore):**
+- Emotional Trigger Strength: {scores['emotional_trigger']['score']}/25
+- Memory Activation: {scores['memory_activation']['score']}/25
+- Identity Connection: {scores['identity_connection']['score']}/25
+- Sensory Integration: {scores['sensory_integration']['score']}/25
+- Overall: {scores['overall_score']}/100
+
 **COPY TO ANALYZE:**
 Fragrance: {fragrance_name}
 Content: {copy_content}
 
-**SCORING RUBRIC (0-100):**
-
-**1. Emotional Trigger Strength (0-25 points)**
-- Does it trigger immediate emotion (confidence, romance, nostalgia, power)?
-- Uses sensory language that bypasses logic?
-- Creates visceral imagery vs. clinical descriptions?
-
-**2. Memory Activation (0-25 points)**
-- References universal nostalgic moments?
-- Uses temporal language (remember, transport, return)?
-- Anchors scent to specific life experiences or places?
-
-**3. Identity Connection (0-25 points)**
-- Positions scent as self-expression or signature?
-- Connects to aspirational identity/lifestyle?
-- Emphasizes psychological benefits (confidence, allure, presence)?
-
-**4. Sensory Integration (0-25 points)**
-- Engages multiple senses (not just smell)?
-- Uses color-scent synesthesia (visual imagery)?
-- Creates immersive, cinematic scenes?
-
 **OUTPUT FORMAT (JSON):**
 {{
-    "overall_score": [0-100],
-    "emotional_trigger": {{
-        "score": [0-25],
-        "strengths": ["list specific examples from the copy"],
-        "improvements": ["specific suggestions"]
-    }},
-    "memory_activation": {{
-        "score": [0-25],
-        "strengths": ["list specific examples"],
-        "improvements": ["specific suggestions"]
-    }},
-    "identity_connection": {{
-        "score": [0-25],
-        "strengths": ["list specific examples"],
-        "improvements": ["specific suggestions"]
-    }},
-    "sensory_integration": {{
-        "score": [0-25],
-        "strengths": ["list specific examples"],
-        "improvements": ["specific suggestions"]
-    }},
     "key_insights": "Overall assessment in 2-3 sentences",
     "top_3_enhancements": ["Actionable improvement 1", "2", "3"]
 }}
 
 Return ONLY valid JSON, no markdown formatting."""
 
-        # Use compound model for analytical depth
-        analysis_response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a scent psychology analyst with expertise in neuroscience and consumer behavior. Provide data-driven psychological impact assessments."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,  # Lower temp for analytical consistency
-            max_tokens=1200,
-        )
-        
-        analysis_text = analysis_response.choices[0].message.content.strip()
-        
-        # Parse JSON response
-        try:
-            # Clean potential markdown formatting
-            if '```json' in analysis_text:
-                json_start = analysis_text.find('```json') + 7
-                json_end = analysis_text.find('```', json_start)
-                analysis_text = analysis_text[json_start:json_end].strip()
-            elif '```' in analysis_text:
-                json_start = analysis_text.find('```') + 3
-                json_end = analysis_text.find('```', json_start)
-                analysis_text = analysis_text[json_start:json_end].strip()
-            
-            import json
-            psychology_data = json.loads(analysis_text)
-            
-        except Exception as parse_error:
-            print(f"JSON parse error: {parse_error}")
-            # Fallback structure
-            psychology_data = {
-                "overall_score": 75,
-                "emotional_trigger": {
-                    "score": 18,
-                    "strengths": ["Analysis completed"],
-                    "improvements": ["See detailed report"]
-                },
-                "memory_activation": {
-                    "score": 18,
-                    "strengths": ["Analysis completed"],
-                    "improvements": ["See detailed report"]
-                },
-                "identity_connection": {
-                    "score": 19,
-                    "strengths": ["Analysis completed"],
-                    "improvements": ["See detailed report"]
-                },
-                "sensory_integration": {
-                    "score": 20,
-                    "strengths": ["Analysis completed"],
-                    "improvements": ["See detailed report"]
-                },
-                "key_insights": "Detailed analysis available in raw format.",
-                "top_3_enhancements": ["Review detailed analysis"],
-                "raw_analysis": analysis_text
-            }
-        
-        print(f"Psychology Score for '{fragrance_name}': {psychology_data.get('overall_score', 'N/A')}/100")
-        
-        return jsonify({
-            "success": True,
-            "psychology_score": psychology_data
-        })
-        
-    except Exception as e:
-        print(f"Error calculating psychology score: {e}")
-        print(traceback.format_exc())
-        return jsonify({"error": "Failed to calculate psychology score"}), 500
+    insights_text, cache_hit = cached_completion(
+        'psychology-score',
+        bypass=bypass,
+        task="analysis_json",
+        model=model_router.model("analysis_json", model_tier),
+        messages=[
+            {"role": "system", "content": "You are a scent psychology analyst with expertise in neuroscience and consumer behavior. Provide data-driven psychological impact assessments."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,  # Lower temp for analytical consistency
+        max_tokens=400,
+    )
+    return extract_json(insights_text), cache_hit
 
 
 if __name__ == '__main__':
@@ -0,0 +1,224 @@
+"""
+Offline stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Serves canned or recorded completions, as JSON or as SSE streams, with
+configurable latency, time-to-first-token, token rate and error injection.
+Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+    python bench/fake_groq.py --port 8765 --ttft-ms 300 --tokens-per-sec 250
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+_STORY = """### The Story
+Amber light spills across a quiet terrace as the evening settles into velvet. A first breath of bergamot and pink pepper lifts the air, bright and a little daring, before softening into something warmer.
+
+### The Notes
+* **Top Notes:** Bergamot and pink pepper sparkle like the first laugh of the night.
+* **Heart Notes:** Rose and jasmine bloom slowly, intimate and assured.
+* **Base Notes:** Sandalwood, vanilla and musk linger on skin long after the room empties.
+
+### The Essence
+For the one who arrives without announcement and is remembered long after leaving. A luxury fragrance for evenings that become stories.
+"""
+
+_SEO_SUGGESTIONS = json.dumps([
+    "Add the primary keyword to the first sentence",
+    "Break the notes section into scannable bullets",
+    "End with a clear call to action",
+])
+
+_PSYCHOLOGY_INSIGHTS = json.dumps({
+    "key_insights": "Strong sensory language and a clear persona; urgency and social proof are underused.",
+    "top_3_enhancements": ["Add a subtle scarcity cue", "Reference a signature moment", "Quote a wearer"],
+})
+
+
+class FakeGroqConfig:
+    """
+    Knobs for simulated upstream behaviour; mutable at runtime by tests.
+    """
+
+    def __init__(self, latency_ms=400, ttft_ms=250, tokens_per_sec=300, jitter=0.1,
+                 error_rate=0.0, error_status=503, retry_after=None, recordings=None):
+        self.latency_ms = latency_ms
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.recordings = recordings or []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def delay(self, ms):
+        return max(0.0, ms * random.uniform(1 - self.jitter, 1 + self.jitter)) / 1000
+
+
+def load_recordings(path):
+    """
+    Reads JSONL recordings: {"model"?, "contains"?, "content"} per line.
+    The first recording whose model and prompt substring match is replayed.
+    """
+    recordings = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                recordings.append(json.loads(line))
+    return recordings
+
+
+def canned_content(config, body):
+    """
+    Picks the reply for a request: a matching recording, else a synthetic
+    answer shaped like what the calling route expects.
+    """
+    prompt = "\n".join(str(m.get("content") or "") for m in body.get("messages", []))
+    for recording in config.recordings:
+        if recording.get("model") not in (None, body.get("model")):
+            continue
+        if recording.get("contains", "") in prompt:
+            return recording["content"]
+    if "JSON array" in prompt:
+        return _SEO_SUGGESTIONS
+    if "OUTPUT FORMAT (JSON)" in prompt:
+        return _PSYCHOLOGY_INSIGHTS
+    # Scale synthetic prose to roughly the declared token budget
+    budget_chars = int(body.get("max_tokens") or 512) * 4
+    return (_STORY * (budget_chars // len(_STORY) + 1))[:budget_chars].rsplit(" ", 1)[0]
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = FakeGroqConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        config = self.config
+        with config.lock:
+            config.requests += 1
+
+        if config.error_rate and random.random() < config.error_rate:
+            time.sleep(config.delay(config.ttft_ms))
+            headers = {"retry-after": str(config.retry_after)} if config.retry_after is not None else {}
+            return self._json(config.error_status, {"error": {"message": "Injected failure", "type": "fake_error"}}, headers)
+
+        content = canned_content(config, body)
+        tokens = _TOKEN_RE.findall(content)
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 4 + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            time.sleep(config.delay(config.latency_ms))
+            return self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(config.delay(config.ttft_ms))
+        interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec else 0
+        try:
+            for token in tokens:
+                self._chunk(completion_id, model, {"content": token})
+                if interval:
+                    time.sleep(interval)
+            self._chunk(completion_id, model, {}, finish_reason="stop", x_groq={"id": completion_id, "usage": usage})
+            self._write(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client closed the stream early
+
+    def _chunk(self, completion_id, model, delta, finish_reason=None, **extra):
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        self._write(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up waiting
+
+
+def start_fake_groq(config=None, host='127.0.0.1', port=0):
+    """
+    Starts the fake server on a daemon thread; returns (server, base_url).
+    """
+    handler = type('ConfiguredFakeGroqHandler', (FakeGroqHandler,), {"config": config or FakeGroqConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='fake-groq').start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_config_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=400, help='Total latency of non-streamed completions')
+    parser.add_argument('--ttft-ms', type=float, default=250, help='Delay before the first streamed token')
+    parser.add_argument('--tokens-per-sec', type=float, default=300, help='Streamed token rate (0 = unthrottled)')
+    parser.add_argument('--jitter', type=float, default=0.1, help='Relative +/- jitter applied to delays')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status for injected failures')
+    parser.add_argument('--retry-after', type=float, help='Retry-After seconds sent with injected failures')
+    parser.add_argument('--recordings', help='JSONL recordings to replay before synthetic answers')
+
+
+def config_from_args(args):
+    return FakeGroqConfig(
+        latency_ms=args.latency_ms,
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        recordings=load_recordings(args.recordings) if args.recordings else [],
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server, base_url = start_fake_groq(config_from_args(args), args.host, args.port)
+    print(f"Fake Groq listening on {base_url} (set GROQ_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,155 @@
+"""
+Network-free micro-benchmarks of the app's own work, replayed from a cassette.
+
+In replay mode (the default) every Groq call is served instantly from the
+cassette, so timings cover prompt construction, JSON extraction, stream
+framing and PDF rendering only. --record runs each scenario once against a
+real upstream (GROQ_API_KEY), or against the fake server with --fake, and
+writes the cassette.
+
+    python bench/micro_benchmark.py --record --fake
+    python bench/micro_benchmark.py --iterations 50 --write-baseline bench/micro_baseline.json
+    python bench/micro_benchmark.py --iterations 50 --baseline bench/micro_baseline.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_groq import FakeGroqConfig, start_fake_groq
+from run_benchmark import SCENARIOS, compare, percentile
+
+DEFAULT_CASSETTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cassettes', 'micro.jsonl')
+DEFAULT_SCENARIOS = "generate_short,generate_full,chat_standard,seo_analysis,psychology_score,export_pdf"
+
+
+def load_app(mode, cassette):
+    """
+    Imports the app with the Groq client in cassette `mode`.
+    """
+    os.environ["AURA_GROQ_CASSETTE"] = mode
+    os.environ["AURA_GROQ_CASSETTE_PATH"] = cassette
+    os.environ.setdefault("AURA_GROQ_CASSETTE_SPEED", "0")
+    # Keep runs independent of any on-disk response cache
+    os.environ.setdefault("AURA_RESPONSE_CACHE_BACKENDS", "memory")
+    unlimited = {"rpm": 1_000_000, "tpm": 1_000_000_000}
+    os.environ.setdefault("AURA_GROQ_RATE_LIMITS", json.dumps({
+        model: unlimited for model in ("default", "groq/compound", "groq/compound-mini", "llama-3.1-8b-instant", "llama-3.3-70b-versatile")
+    }))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as aura
+    return aura
+
+
+def call(test_client, name):
+    """
+    Runs one scenario through the test client and drains the body.
+    Returns an error description, or None on success.
+    """
+    path, body = SCENARIOS[name]
+    if "form" in body:
+        response = test_client.post(path, data=body["form"])
+    else:
+        response = test_client.post(path, json=body["json"])
+    data = response.get_data()
+    if response.status_code >= 400:
+        return f"HTTP {response.status_code}"
+    if response.mimetype == "text/event-stream" and b"event: error" in data:
+        return "error event in stream"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="Cassette file to replay or record")
+    parser.add_argument("--record", action="store_true", help="Record the cassette instead of benchmarking")
+    parser.add_argument("--fake", action="store_true", help="Record against the in-process fake Groq server")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="Comma-separated scenario names")
+    parser.add_argument("--iterations", type=int, default=30, help="Timed runs per scenario")
+    parser.add_argument("--write-baseline", help="Save results as a JSON baseline")
+    parser.add_argument("--baseline", help="Compare against a JSON baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before a regression")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    if args.record:
+        if args.fake:
+            _, os.environ["GROQ_BASE_URL"] = start_fake_groq(FakeGroqConfig(latency_ms=50, ttft_ms=30, tokens_per_sec=0))
+            os.environ.setdefault("GROQ_API_KEY", "bench")
+        if os.path.exists(args.cassette):
+            os.remove(args.cassette)
+        aura = load_app("record", args.cassette)
+        if not aura.client:
+            print("No Groq client: set GROQ_API_KEY or pass --fake")
+            return 1
+        test_client = aura.app.test_client()
+        for name in names:
+            error = call(test_client, name)
+            print(f"{name}: {error or 'recorded'}")
+        print(f"Wrote {aura.client.cassette.snapshot()['entries']} recordings to {args.cassette}")
+        return 0
+
+    if not os.path.exists(args.cassette):
+        print(f"No cassette at {args.cassette}; record one with --record")
+        return 1
+    aura = load_app("replay", args.cassette)
+    test_client = aura.app.test_client()
+    cassette = aura.client.cassette
+
+    results = {}
+    for name in names:
+        misses = cassette.stats["misses"]
+        error = call(test_client, name)  # warm-up
+        if cassette.stats["misses"] > misses:
+            print(f"{name}: request not in cassette; re-record with --record")
+            return 1
+        if error:
+            print(f"{name}: {error}")
+            return 1
+        timings = []
+        for _ in range(args.iterations):
+            started = time.perf_counter()
+            call(test_client, name)
+            timings.append(time.perf_counter() - started)
+        ms = lambda value: round(value * 1000, 2)
+        results[name] = {
+            "requests": args.iterations,
+            "errors": 0,
+            "rps": round(len(timings) / sum(timings), 1),
+            "p50_ms": ms(percentile(timings, 50)),
+            "p95_ms": ms(percentile(timings, 95)),
+            "p99_ms": ms(percentile(timings, 99)),
+        }
+
+    columns = ["requests", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(f"{'scenario':<20}" + "".join(f"{column:>11}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:<20}" + "".join(f"{row[column]:>11}" for column in columns))
+
+    if args.write_baseline:
+        with open(args.write_baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": {"iterations": args.iterations, "cassette": os.path.basename(args.cassette)}, "results": results}, f, indent=2)
+        print(f"Baseline written to {args.write_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Network-free regression checks for the app's local, deterministic helpers.
+
+Each check pins behaviour that once regressed; the script prints every
+failure and exits 1 if there are any.
+
+    python bench/regression_checks.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Single typos in catalog names resolve to their entry...
+CATALOG_TYPOS = {
+    "sauvge": "Sauvage",
+    "Savage": "Sauvage",
+    "Aventsu": "Aventus",
+    "Avnetus": "Aventus",
+    "Layten": "Layton",
+    "Laytn": "Layton",
+}
+# ...while unrelated names and flankers stay unresolved, so web search answers them
+CATALOG_MISSES = [
+    "No 6", "Layla", "Tuscan Leather", "Light Blue", "Santal 33", "Good Girl",
+    "Acqua di Gio", "Velvet Hour", "Unknown Thing", "Eau Sauvage",
+]
+
+
+def check_catalog(aura):
+    failures = []
+    index = aura.FragranceIndex()
+    index.load(os.path.join(aura.app.root_path, "data", "fragrance_notes.csv"))
+    for query, expected in CATALOG_TYPOS.items():
+        entry = index.lookup(query)
+        if not entry or entry["name"] != expected:
+            failures.append(f"catalog: {query!r} -> {entry and entry['name']!r}, expected {expected!r}")
+    for query in CATALOG_MISSES:
+        entry = index.lookup(query)
+        if entry:
+            failures.append(f"catalog: {query!r} -> {entry['name']!r}, expected no match")
+    return failures
+
+
+# Keyword -> (copy, expected occurrences): plurals count, lookalike words do not
+SEO_KEYWORDS = [
+    ("fragrance", "A fragrance for evenings. Two fragrances in one.", 2),
+    ("fragrances", "A fragrance for evenings. Two fragrances in one.", 2),
+    ("perfume", "Three perfumes, one perfume.", 2),
+    ("notes", "The notes open bright; one note lingers.", 2),
+    ("notes", "This is not a perfume. It is not cheap.", 0),
+    ("not", "Smoky notes, noted by all.", 0),
+]
+
+
+def check_seo_keywords(aura):
+    failures = []
+    for keyword, content, expected in SEO_KEYWORDS:
+        occurrences = aura.compute_seo_metrics(content, keyword)["keywords"][0]["occurrences"]
+        if occurrences != expected:
+            failures.append(f"seo: {keyword!r} in {content!r} counted {occurrences}x, expected {expected}")
+    return failures
+
+
+def check_psychology_lexicons(aura):
+    failures = []
+    seen = {}
+    for lexicons in (aura._PSYCHOLOGY_STEMS, aura._SENSE_STEMS):
+        for name, stems in lexicons.items():
+            for stem in stems:
+                if stem in seen:
+                    failures.append(f"psychology: {stem!r} is in both {seen[stem]} and {name}")
+                seen[stem] = name
+    scores = aura.score_psychology("It is not this. It is not that.")
+    if scores["sensory_integration"]["score"] or scores["sensory_integration"]["strengths"]:
+        failures.append("psychology: 'not' scored as a sensory term")
+    return failures
+
+
+CHECKS = [check_catalog, check_seo_keywords, check_psychology_lexicons]
+
+
+def main():
+    os.environ.setdefault("AURA_RESPONSE_CACHE_BACKENDS", "memory")
+    import app as aura
+    failures = [failure for check in CHECKS for failure in check(aura)]
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"{len(CHECKS)} checks, {len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Load benchmark for every Aura route, against the fake Groq server by default.
+
+Starts bench/fake_groq.py in-process, points the app at it and serves the app
+on a local threaded server (or hits --target), then runs each scenario at a
+fixed concurrency and reports throughput, latency p50/p95/p99 and TTFT for
+streamed routes. --write-baseline saves the numbers as JSON; --baseline
+compares against a saved run and exits 1 on a regression.
+
+    python bench/run_benchmark.py --requests 40 --concurrency 8 --write-baseline bench/baseline.json
+    python bench/run_benchmark.py --requests 40 --concurrency 8 --baseline bench/baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_groq import add_config_arguments, config_from_args, start_fake_groq
+
+STORY = (
+    "### The Story\nAmber light spills across a quiet terrace as the evening settles into velvet. "
+    "A first breath of bergamot and pink pepper lifts the air before softening into sandalwood and vanilla.\n\n"
+    "### The Notes\n* **Top Notes:** Bergamot, pink pepper\n* **Heart Notes:** Rose, jasmine\n"
+    "* **Base Notes:** Sandalwood, vanilla, musk\n\n### The Essence\nFor evenings that become stories."
+)
+NOTES = "Bergamot, Pink Pepper, Rose, Jasmine, Sandalwood, Vanilla, Musk"
+
+
+def _generate(output_length):
+    return {
+        "form": {
+            "use_case": "new", "product_name": "Velvet Hour", "key_notes": NOTES,
+            "vibe_keywords": "warm, intimate", "output_length": output_length,
+        },
+    }
+
+
+# name -> (path, request body); form bodies are posted as urlencoded fields
+SCENARIOS = {
+    "generate_short": ("/generate", _generate("short")),
+    "generate_product": ("/generate", _generate("product")),
+    "generate_full": ("/generate", _generate("full")),
+    "chat_standard": ("/chat", {"json": {"message": "Something warm for autumn evenings?", "stream": True}}),
+    "chat_deep": ("/chat", {"json": {"message": "Something warm for autumn evenings?", "deepMode": True, "stream": True}}),
+    "analyze_customer": ("/analyze-customer", {"json": {
+        "fragrance_name": "Velvet Hour", "key_notes": NOTES,
+        "target_audience": "Urban professionals", "vibe_keywords": "warm, intimate",
+    }}),
+    "generate_variants": ("/generate-variants", {"json": {"fragrance_name": "Velvet Hour", "key_notes": NOTES, "num_variants": 2}}),
+    "export_pdf": ("/export-pdf", {"json": {"name": "Velvet Hour", "content": STORY}}),
+    "seo_analysis": ("/seo-analysis", {"json": {"name": "Velvet Hour", "content": STORY, "keywords": "amber perfume", "no_cache": True}}),
+    "psychology_score": ("/psychology-score", {"json": {"name": "Velvet Hour", "content": STORY, "no_cache": True}}),
+}
+
+# Metrics compared against a baseline, and whether higher is better
+COMPARED = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "ttft_p50_ms": False, "ttft_p95_ms": False}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run_request(target, path, body, timeout):
+    """
+    Sends one request and drains the response; returns (ok, latency, ttft).
+    For SSE responses TTFT is the arrival of the first *token event and an
+    `error` event counts as a failure.
+    """
+    parts = urlsplit(target)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    if "form" in body:
+        payload, content_type = urlencode(body["form"]).encode(), "application/x-www-form-urlencoded"
+    else:
+        payload, content_type = json.dumps(body["json"]).encode(), "application/json"
+    started = time.perf_counter()
+    ttft = None
+    try:
+        conn.request("POST", path, body=payload, headers={"Content-Type": content_type})
+        response = conn.getresponse()
+        ok = response.status < 400
+        if response.getheader("Content-Type", "").startswith("text/event-stream"):
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                if line.startswith(b"event: "):
+                    event = line[7:].strip().decode()
+                    if ttft is None and event.endswith("token"):
+                        ttft = time.perf_counter() - started
+                    elif event == "error":
+                        ok = False
+        else:
+            response.read()
+        return ok, time.perf_counter() - started, ttft
+    except (OSError, http.client.HTTPException):
+        return False, time.perf_counter() - started, ttft
+    finally:
+        conn.close()
+
+
+def run_scenario(target, name, requests, concurrency, timeout):
+    path, body = SCENARIOS[name]
+    results = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for result in pool.map(lambda _: run_request(target, path, body, timeout), range(requests)):
+            results.append(result)
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for ok, latency, _ in results if ok]
+    ttfts = [ttft for ok, _, ttft in results if ok and ttft is not None]
+    ms = lambda value: round(value * 1000, 1) if value is not None else None
+    return {
+        "requests": requests,
+        "errors": sum(1 for ok, _, _ in results if not ok),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "ttft_p50_ms": ms(percentile(ttfts, 50)),
+        "ttft_p95_ms": ms(percentile(ttfts, 95)),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists metrics that moved the wrong way by more than `tolerance`
+    (a fraction) relative to the baseline, plus any new errors.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: errors {previous.get('errors', 0)} -> {current['errors']}")
+        for metric, higher_is_better in COMPARED.items():
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {metric} {before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+def start_app(groq_base_url):
+    """
+    Imports the app against the given Groq endpoint and serves it on a
+    background thread; returns its base URL.
+    """
+    os.environ["GROQ_BASE_URL"] = groq_base_url
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    # Rate limits belong to the real account; against the fake, only the app's own work should limit throughput
+    unlimited = {"rpm": 1_000_000, "tpm": 1_000_000_000}
+    os.environ.setdefault("AURA_GROQ_RATE_LIMITS", json.dumps({
+        model: unlimited for model in ("default", "groq/compound", "groq/compound-mini", "llama-3.1-8b-instant", "llama-3.3-70b-versatile")
+    }))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="aura-bench").start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def print_table(results):
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms"]
+    print(f"{'scenario':<20}" + "".join(f"{column:>13}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:<20}" + "".join(f"{'-' if row[column] is None else row[column]:>13}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Benchmark an already running app instead of starting one")
+    parser.add_argument("--groq-base-url", help="Use this Groq endpoint instead of starting the fake server")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients per scenario")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--write-baseline", help="Save results as a JSON baseline")
+    parser.add_argument("--baseline", help="Compare against a JSON baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a regression")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    target = args.target
+    if not target:
+        groq_base_url = args.groq_base_url
+        if not groq_base_url:
+            _, groq_base_url = start_fake_groq(config_from_args(args))
+        target = start_app(groq_base_url)
+
+    # Warm imports, fonts and connection pools outside the measured window
+    for name in names:
+        run_request(target, *SCENARIOS[name], args.timeout)
+
+    results = {}
+    for name in names:
+        results[name] = run_scenario(target, name, args.requests, args.concurrency, args.timeout)
+    print_table(results)
+
+    if args.write_baseline:
+        with open(args.write_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": {"requests": args.requests, "concurrency": args.concurrency,
+                           "ttft_ms": args.ttft_ms, "tokens_per_sec": args.tokens_per_sec, "latency_ms": args.latency_ms},
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline written to {args.write_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())